@@ -1,17 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
-from typing import List, Dict, Any, Annotated
-import json
-import httpx
-from google import genai
-from google.genai import types as genai_types
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Header
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from typing import List, Dict, Any, Annotated, AsyncIterator, Optional
 from google.genai.errors import APIError
 
 # --- CRITICAL FIX: Direct imports from the schema file ---
 from ..schemas.llm_schemas import (
-    TaggingRequest, TaggingResponse, ChatRequest, ChatMessage, MessageRole,
+    TaggingRequest, TaggingResponse, BatchTaggingRequest, BatchTaggingResponse, ChatRequest, ChatMessage, MessageRole,
     TradeSummary, ToolOutput
 )
 from ..libs.config import settings
+from ..libs.fast_json import dumps
+from ..libs.admission import (
+    CHAT_ADMISSION, DEFAULT_TIER, AdmissionPool, AdmissionRejected, AdmissionTicket
+)
+from ..libs.llm_client import AsyncLLMClient, get_llm_client
+from ..libs.tagging import TAG_CACHE, generate_tags, generate_tags_batch
+from ..libs.ai_tools import (
+    TOOL_REGISTRY, ToolBudgetExceeded, ToolContext, run_tool_loop, stream_tool_loop
+)
+from ..libs.context_cache import CONTEXT_CACHE, uncached_turn
+from ..libs.resilience import CircuitOpenError
+from ..libs.history import compact_history
+from ..libs.prompts import chat_system_prompt, plan_tier
+from ..libs.data_fetcher import get_data_fetcher
+from ..libs.metrics import begin_endpoint, span
+from ..libs.semantic_cache import SEMANTIC_CACHE, SemanticLookup
+from ..libs.session_store import SessionHistory, get_session_store, message_to_content
 # --------------------------------------------------------
 
 # Initialize the router
@@ -39,17 +54,28 @@ def verify_internal_auth(
 VerifyInternalAuth = Depends(verify_internal_auth)
 
 
-# --- LLM Client Initialization ---
-try:
-    LLM_CLIENT = genai.Client(api_key=settings.GEMINI_API_KEY)
-except Exception as e:
-    print(f"FATAL LLM ERROR: Failed to initialize Gemini Client. Check GEMINI_API_KEY. Error: {e}")
-    LLM_CLIENT = None
+# --- Admission Control ---
 
-# --- Internal HTTP Client for Data Fetching ---
-DATA_FETCHER_CLIENT = httpx.AsyncClient(
-    base_url=settings.MAIN_BACKEND_URL,
-)
+def overloaded(e: AdmissionRejected) -> HTTPException:
+    """503 with Retry-After, so the main backend backs off instead of retrying at once."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+def unavailable(e: CircuitOpenError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+async def admit(pool: AdmissionPool, tier: str = DEFAULT_TIER) -> AdmissionTicket:
+    try:
+        return await pool.acquire(tier)
+    except AdmissionRejected as e:
+        raise overloaded(e)
 
 
 # =====================================================================
@@ -63,35 +89,28 @@ DATA_FETCHER_CLIENT = httpx.AsyncClient(
 )
 async def tag_trade(
     request: TaggingRequest,
+    response: Response,
 ):
     """
     Analyzes trade notes and returns a structured JSON list of tags.
-    This is called synchronously during the trade creation process.
+    This is called synchronously during the trade creation process, so while
+    the Gemini circuit is open it answers at once with no tags (marked by the
+    `X-TradeLM-Degraded` header) rather than blocking trade creation.
     """
-    if not LLM_CLIENT:
+    begin_endpoint("tag_trade")
+    llm = get_llm_client()
+    if not llm:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="AI Service is not initialized.")
-        
-    tagging_prompt = f"""
-    Analyze the following trading journal notes and generate a list of 
-    relevant tags. The tags should be short (e.g., 'FOMO', 'Breakout', 
-    'Poor Exit', 'Reversal', 'Good R:R'). 
-    Only return the JSON object.
-
-    NOTES: {request.notes}
-    """
     
     try:
-        response = LLM_CLIENT.models.generate_content(
-            model=settings.GEMINI_MODEL,
-            contents=[tagging_prompt],
-            config=genai_types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=TaggingResponse, # CORRECT USAGE
-            ),
-        )
-
-        return TaggingResponse.model_validate_json(response.text)
+        return await generate_tags(llm, request.notes)
 
+    except AdmissionRejected as e:
+        raise overloaded(e)
+    except CircuitOpenError as e:
+        response.headers["X-TradeLM-Degraded"] = "llm-unavailable"
+        response.headers["Retry-After"] = str(e.retry_after)
+        return TaggingResponse(tags=[])
     except APIError as e:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
@@ -104,38 +123,117 @@ async def tag_trade(
         )
 
 
+@router.post(
+    "/tag-trades",
+    response_model=BatchTaggingResponse,
+    dependencies=[VerifyInternalAuth],
+)
+async def tag_trades(
+    request: BatchTaggingRequest,
+):
+    """
+    Tags a batch of trade notes (e.g. a broker statement import) in a few
+    packed LLM calls, each admitted through the batch tagging pool. Failures
+    are reported per item instead of failing the batch; only a batch with no
+    chunk admitted is a 503.
+    """
+    begin_endpoint("tag_trades")
+    llm = get_llm_client()
+    if not llm:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="AI Service is not initialized.")
+
+    try:
+        results = await generate_tags_batch(llm, [item.notes for item in request.items])
+    except AdmissionRejected as e:
+        raise overloaded(e)
+    return BatchTaggingResponse(results=results)
+
+
+@router.get(
+    "/tag-trade/cache-stats",
+    dependencies=[VerifyInternalAuth],
+)
+async def tag_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for the tagging cache, for monitoring."""
+    return TAG_CACHE.stats()
+
+
 # =====================================================================
 # 2. CHAT & TOOL CALLING ENDPOINT
 # =====================================================================
 
-async def get_user_trade_summary(user_id: str) -> str:
-    """Mocks fetching anonymized trade data for the LLM."""
-    return f"""
-        [Anonymized Trade Summary for ID {user_id}]:
-        - Total Trades in Q4: 150
-        - Net P/L: +$12,500
-        - Best Strategy: Breakout (70% Win Rate)
-        - Worst Mistake: Over-leveraging on Fridays.
-    """
-
-TOOL_CONFIG = genai_types.Tool(
-    function_declarations=[
-        genai_types.FunctionDeclaration(
-            name="get_user_trade_summary",
-            description="Use this tool to fetch the user's current, anonymized trading performance summary (PNL, best strategy, mistakes) from the database to answer analytical questions.",
-            parameters=genai_types.Schema(
-                type=genai_types.Type.OBJECT,
-                properties={
-                    "user_id": genai_types.Schema(
-                        type=genai_types.Type.STRING,
-                        description="The anonymous ID of the user whose data should be retrieved."
-                    )
-                },
-                required=["user_id"],
-            ),
+@router.post(
+    "/users/{user_id}/trades/invalidate",
+    dependencies=[VerifyInternalAuth],
+)
+async def invalidate_user_trades(user_id: str) -> Dict[str, Any]:
+    """
+    Called by the main backend whenever a user's trades are created, edited or
+    deleted, so the next tool call fetches fresh data instead of the cache.
+    """
+    version = get_data_fetcher().invalidate_user(user_id)
+    SEMANTIC_CACHE.drop_user(user_id)
+    return {"user_id": user_id, "data_version": version}
+
+async def load_session_history(session_id: str, request: ChatRequest) -> SessionHistory:
+    """
+    Returns the session's stored history with its pre-converted contents (excluding `new_message`).
+
+    If the backend sends `history`, it replaces the stored session (resync).
+    If it sends only `new_message`, the stored history is used, and an
+    unknown session is a 409 so the backend can resend the full history.
+    """
+    if request.history is not None:
+        messages = list(request.history)
+        if messages and (messages[-1].role, messages[-1].content) == (request.new_message.role, request.new_message.content):
+            messages.pop()
+        history = SessionHistory(messages)
+        await get_session_store().save(session_id, history)
+    else:
+        history = await get_session_store().get(session_id)
+        if history is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Unknown chat session. Resend the request with the full history.",
+            )
+
+    return history
+
+async def semantic_lookup(
+    llm: AsyncLLMClient, session_id: str, request: ChatRequest, history: SessionHistory, plan_key: str
+) -> Optional[SemanticLookup]:
+    """
+    Looks the new message up in the semantic answer cache, in the context of
+    the previous user turn. On a hit (`lookup.answer` set) the exchange is
+    persisted here and no LLM call is needed.
+    """
+    previous = next((m.content for m in reversed(history.messages) if m.role == MessageRole.USER), None)
+    with span("semantic_cache"):
+        lookup = await SEMANTIC_CACHE.lookup(
+            llm,
+            user_id=request.user_id,
+            plan_key=plan_key,
+            message=request.new_message.content,
+            data_version=get_data_fetcher().data_version(request.user_id),
+            previous_message=previous,
         )
-    ]
+    if lookup is not None and lookup.answer is not None:
+        reply = ChatMessage(role=MessageRole.ASSISTANT, content=lookup.answer)
+        with span("persist"):
+            await get_session_store().append(session_id, [request.new_message, reply])
+    return lookup
+
+@router.delete(
+    "/chat/{session_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[VerifyInternalAuth],
 )
+async def delete_chat_session(session_id: str):
+    """Drops the server-side history for a session (e.g. when the user deletes the chat)."""
+    await get_session_store().delete(session_id)
+    llm = get_llm_client()
+    if llm:
+        await CONTEXT_CACHE.drop_session(llm, session_id)
 
 @router.post(
     "/chat/{session_id}",
@@ -145,74 +243,67 @@ TOOL_CONFIG = genai_types.Tool(
 async def chat_with_ai(
     session_id: str,
     request: ChatRequest, # CORRECT USAGE
+    response: Response,
 ):
     """
     Processes the chat request, handles history, calls tools, and returns the AI's response.
+    Paraphrases of an earlier data question are answered from the semantic
+    cache (marked by `X-TradeLM-Cache: semantic-hit`) without calling Gemini.
     """
-    if not LLM_CLIENT:
+    begin_endpoint("chat")
+    llm = get_llm_client()
+    if not llm:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="AI Service is not initialized.")
 
-    gemini_contents = []
-    for msg in request.history:
-        gemini_contents.append(
-            genai_types.Content(
-                role="user" if msg.role in [MessageRole.USER, MessageRole.TOOL] else "model",
-                parts=[genai_types.Part.from_text(msg.content)]
-            )
-        )
-    
-    system_instruction = f"""
-    You are TradeLM, an expert AI Trading Analyst. Your persona is professional, 
-    data-driven, and focused on helping the user improve their trading performance. 
-    The user's current plan is: {request.user_plan.upper()}.
-    If the user asks an analytical question (e.g., 'What is my win rate?', 'Why did I lose money?'), 
-    you MUST use the available tool: 'get_user_trade_summary' to gather data 
-    before generating your final answer.
-    """
+    with span("load_history"):
+        history = await load_session_history(session_id, request)
+    system_prompt = chat_system_prompt(request.user_plan)
+    lookup = await semantic_lookup(llm, session_id, request, history, system_prompt.template_id)
+    if lookup is not None and lookup.answer is not None:
+        response.headers["X-TradeLM-Cache"] = "semantic-hit"
+        return ChatMessage(role=MessageRole.ASSISTANT, content=lookup.answer)
+    ticket = await admit(CHAT_ADMISSION, plan_tier(request.user_plan))
     
     try:
-        gemini_response = LLM_CLIENT.models.generate_content(
-            model=settings.GEMINI_MODEL,
+        with span("compact_history"):
+            history_contents = await compact_history(llm, session_id, history)
+        tools = [TOOL_REGISTRY.tool_config]
+        new_contents = [message_to_content(request.new_message)]
+        with span("context_cache"):
+            gemini_contents, config = await CONTEXT_CACHE.prepare(
+                llm,
+                session_id=session_id,
+                plan_key=f"{system_prompt.template_id}|tools:{TOOL_REGISTRY.fingerprint}",
+                system_instruction=system_prompt.content,
+                tools=tools,
+                history=history_contents,
+                new_contents=new_contents,
+            )
+        gemini_response, called = await run_tool_loop(
+            llm,
             contents=gemini_contents,
-            config=genai_types.GenerateContentConfig(
-                system_instruction=system_instruction,
-                tools=[TOOL_CONFIG]
-            ),
+            config=config,
+            context=ToolContext(user_id=request.user_id, session_id=session_id),
+            uncached=uncached_turn(system_prompt.content, tools, history_contents, new_contents),
         )
 
-        if gemini_response.function_calls:
-            first_call = gemini_response.function_calls[0]
-            
-            if first_call.name == "get_user_trade_summary":
-                tool_output = await get_user_trade_summary(request.user_id)
-
-                tool_response = LLM_CLIENT.models.generate_content(
-                    model=settings.GEMINI_MODEL,
-                    contents=gemini_contents + [
-                         genai_types.Content(
-                             role="tool", 
-                             parts=[
-                                genai_types.Part.from_function_response(
-                                    name="get_user_trade_summary", 
-                                    response={"summary": tool_output}
-                                )
-                             ]
-                         )
-                    ],
-                )
-                
-                response_text = tool_response.text
-            else:
-                 response_text = "ERROR: Unknown tool requested."
-        
-        else:
-            response_text = gemini_response.text
-
-        return ChatMessage(
+        reply = ChatMessage(
             role=MessageRole.ASSISTANT, 
-            content=response_text
+            content=gemini_response.text or ""
         )
+        with span("persist"):
+            await get_session_store().append(session_id, [request.new_message, reply])
+        if lookup is not None and called:
+            SEMANTIC_CACHE.store(lookup, reply.content)
+        return reply
 
+    except ToolBudgetExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e),
+        )
+    except CircuitOpenError as e:
+        raise unavailable(e)
     except APIError as e:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
@@ -222,4 +313,110 @@ async def chat_with_ai(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred in the chat processing flow: {e}",
-        )
\ No newline at end of file
+        )
+    finally:
+        ticket.release()
+
+
+# =====================================================================
+# 3. STREAMING CHAT ENDPOINT (Server-Sent Events)
+# =====================================================================
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+@router.post(
+    "/chat/{session_id}/stream",
+    dependencies=[VerifyInternalAuth],
+)
+async def chat_with_ai_stream(
+    session_id: str,
+    request: ChatRequest,
+):
+    """
+    Streaming variant of `/chat/{session_id}`. Emits `token` events as text
+    arrives (including during the post-tool pass), then a final `done` event
+    carrying the complete ChatMessage, or an `error` event on failure.
+    """
+    begin_endpoint("chat_stream")
+    llm = get_llm_client()
+    if not llm:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="AI Service is not initialized.")
+
+    with span("load_history"):
+        history = await load_session_history(session_id, request)
+    system_prompt = chat_system_prompt(request.user_plan)
+    lookup = await semantic_lookup(llm, session_id, request, history, system_prompt.template_id)
+    if lookup is not None and lookup.answer is not None:
+        message = ChatMessage(role=MessageRole.ASSISTANT, content=lookup.answer)
+        events = [_sse_event("token", {"text": lookup.answer}), _sse_event("done", message.model_dump())]
+        return StreamingResponse(
+            iter(events),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-TradeLM-Cache": "semantic-hit"},
+        )
+    # Held until the stream ends; rejection is still a plain 503 before any event is sent.
+    ticket = await admit(CHAT_ADMISSION, plan_tier(request.user_plan))
+
+    async def event_stream() -> AsyncIterator[str]:
+        response_parts: List[str] = []
+        called_tools = False
+        try:
+            with span("compact_history"):
+                history_contents = await compact_history(llm, session_id, history)
+            tools = [TOOL_REGISTRY.tool_config]
+            new_contents = [message_to_content(request.new_message)]
+            with span("context_cache"):
+                gemini_contents, config = await CONTEXT_CACHE.prepare(
+                    llm,
+                    session_id=session_id,
+                    plan_key=f"{system_prompt.template_id}|tools:{TOOL_REGISTRY.fingerprint}",
+                    system_instruction=system_prompt.content,
+                    tools=tools,
+                    history=history_contents,
+                    new_contents=new_contents,
+                )
+            context = ToolContext(user_id=request.user_id, session_id=session_id)
+            uncached = uncached_turn(system_prompt.content, tools, history_contents, new_contents)
+            async for event, value in stream_tool_loop(llm, gemini_contents, config, context, uncached=uncached):
+                if event == "token":
+                    response_parts.append(value)
+                    yield _sse_event("token", {"text": value})
+                else:
+                    called_tools = True
+                    yield _sse_event("tool_call", {"name": value})
+
+            message = ChatMessage(role=MessageRole.ASSISTANT, content="".join(response_parts))
+            with span("persist"):
+                await get_session_store().append(session_id, [request.new_message, message])
+            if lookup is not None and called_tools:
+                SEMANTIC_CACHE.store(lookup, message.content)
+            yield _sse_event("done", message.model_dump())
+
+        except ToolBudgetExceeded as e:
+            yield _sse_event("error", {"status_code": status.HTTP_504_GATEWAY_TIMEOUT, "detail": str(e)})
+        except CircuitOpenError as e:
+            yield _sse_event(
+                "error",
+                {"status_code": status.HTTP_503_SERVICE_UNAVAILABLE, "detail": str(e), "retry_after": e.retry_after},
+            )
+        except APIError as e:
+            yield _sse_event("error", {"status_code": status.HTTP_502_BAD_GATEWAY, "detail": f"Gemini API Error: {e}"})
+        except Exception as e:
+            yield _sse_event(
+                "error",
+                {
+                    "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    "detail": f"An unexpected error occurred in the chat processing flow: {e}",
+                },
+            )
+        finally:
+            ticket.release()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also releases the slot if the client disconnects before the stream starts.
+        background=BackgroundTask(ticket.release),
+    )
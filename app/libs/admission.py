@@ -0,0 +1,221 @@
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Mapping, Optional
+import asyncio
+import math
+import time
+
+from .config import settings
+from .metrics import METRICS
+
+ADMISSION_IN_FLIGHT = METRICS.gauge(
+    "tradelm_admission_in_flight",
+    "Requests currently holding an admission slot.",
+    ("pool",),
+)
+ADMISSION_QUEUED = METRICS.gauge(
+    "tradelm_admission_queued",
+    "Requests waiting for an admission slot.",
+    ("pool", "tier"),
+)
+ADMISSION_WAIT_SECONDS = METRICS.histogram(
+    "tradelm_admission_queue_wait_seconds",
+    "Time admitted requests spent waiting for a slot.",
+    ("pool", "tier"),
+)
+ADMISSION_REJECTED = METRICS.counter(
+    "tradelm_admission_rejected_total",
+    "Requests shed with 503 before reaching Gemini.",
+    ("pool", "tier", "reason"),
+)
+
+DEFAULT_TIER = "default"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a pool is saturated; `retry_after` is a hint in whole seconds."""
+
+    def __init__(self, pool: str, reason: str, retry_after: int):
+        super().__init__(f"{pool} is overloaded ({reason}). Retry in {retry_after}s.")
+        self.pool = pool
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """An acquired slot. `release()` is idempotent so every exit path can call it."""
+
+    __slots__ = ("_pool", "_started", "_released")
+
+    def __init__(self, pool: "AdmissionPool"):
+        self._pool = pool
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._pool._release(time.monotonic() - self._started)
+
+
+class AdmissionPool:
+    """
+    Bounded concurrency in front of the LLM for one class of traffic.
+
+    Up to `max_concurrency` requests run at once; up to `max_queue` more wait
+    for at most `queue_timeout_s`. Anything beyond that is rejected
+    immediately, so bursts are shed with a 503 instead of piling up on
+    Gemini and turning into 429s and timeouts. Limits are per worker process.
+
+    Waiters are queued per tier (FIFO within a tier). When a slot frees up,
+    tiers are served by stride scheduling on `weights`: with pro=4, free=1
+    and both queues busy, pro gets four slots for every free one, so pro is
+    dispatched first under contention without starving free. Tiers missing
+    from `weights` count as 1.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout_s: float,
+        weights: Optional[Mapping[str, float]] = None,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.weights = {tier: max(float(w), 1e-3) for tier, w in (weights or {}).items()}
+        self.in_flight = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {}
+        self._queued = 0
+        # Stride scheduling: each tier's virtual time advances by 1/weight per
+        # dispatch; the busiest-but-least-served tier (lowest pass) goes next.
+        self._pass: Dict[str, float] = {}
+        self._vtime = 0.0
+        # Moving average of how long a slot is held, for Retry-After hints.
+        self._avg_hold_s = 1.0
+
+    def _update_gauges(self, tier: str) -> None:
+        ADMISSION_IN_FLIGHT.set(self.in_flight, self.name)
+        ADMISSION_QUEUED.set(len(self._queues.get(tier, ())), self.name, tier)
+
+    def retry_after(self) -> int:
+        backlog = (self._queued + 1) / max(self.max_concurrency, 1)
+        return max(1, math.ceil(backlog * self._avg_hold_s))
+
+    def _reject(self, tier: str, reason: str) -> AdmissionRejected:
+        ADMISSION_REJECTED.inc(self.name, tier, reason)
+        return AdmissionRejected(self.name, reason, self.retry_after())
+
+    def _enqueue(self, tier: str) -> asyncio.Future:
+        queue = self._queues.setdefault(tier, deque())
+        if not queue:
+            # A tier that was idle must not bank credit and then monopolise slots.
+            self._pass[tier] = max(self._pass.get(tier, 0.0), self._vtime)
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        self._queued += 1
+        self._update_gauges(tier)
+        return waiter
+
+    def _dequeue(self, tier: str, waiter: asyncio.Future) -> None:
+        try:
+            self._queues[tier].remove(waiter)
+        except (KeyError, ValueError):
+            return
+        self._queued -= 1
+        self._update_gauges(tier)
+
+    def _next_tier(self) -> Optional[str]:
+        busy = [tier for tier, queue in self._queues.items() if queue]
+        if not busy:
+            return None
+        return min(busy, key=lambda tier: self._pass[tier])
+
+    async def acquire(self, tier: str = DEFAULT_TIER) -> AdmissionTicket:
+        if self.in_flight < self.max_concurrency and not self._queued:
+            self.in_flight += 1
+            self._update_gauges(tier)
+            ADMISSION_WAIT_SECONDS.observe(0.0, self.name, tier)
+            return AdmissionTicket(self)
+
+        if self._queued >= self.max_queue:
+            raise self._reject(tier, "queue_full")
+
+        waiter = self._enqueue(tier)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout_s)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on.
+                self._release(None)
+            else:
+                waiter.cancel()
+                self._dequeue(tier, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject(tier, "queue_timeout")
+            raise
+
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - start, self.name, tier)
+        return AdmissionTicket(self)
+
+    def _release(self, held_s) -> None:
+        if held_s is not None:
+            self._avg_hold_s = 0.9 * self._avg_hold_s + 0.1 * held_s
+        # Hand the slot straight to the next live waiter; in_flight is unchanged.
+        while (tier := self._next_tier()) is not None:
+            waiter = self._queues[tier].popleft()
+            self._queued -= 1
+            if waiter.done():
+                continue
+            self._vtime = self._pass[tier]
+            self._pass[tier] += 1.0 / self.weights.get(tier, 1.0)
+            waiter.set_result(None)
+            self._update_gauges(tier)
+            return
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight, self.name)
+
+    @asynccontextmanager
+    async def admit(self, tier: str = DEFAULT_TIER) -> AsyncIterator[AdmissionTicket]:
+        ticket = await self.acquire(tier)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+
+# `/tag-trade` runs inside trade creation on the main backend and must stay
+# fast; chat gets its own pool so long tool-calling turns cannot starve it.
+TAG_ADMISSION = AdmissionPool(
+    "tag",
+    max_concurrency=settings.TAG_ADMISSION_MAX_CONCURRENCY,
+    max_queue=settings.TAG_ADMISSION_MAX_QUEUE,
+    queue_timeout_s=settings.TAG_ADMISSION_QUEUE_TIMEOUT_S,
+)
+# Batch imports take a slot per chunk, in a pool of their own so a large
+# import can neither hide its Gemini calls nor hold trade-creation slots.
+TAG_BATCH_ADMISSION = AdmissionPool(
+    "tag_batch",
+    max_concurrency=settings.TAG_BATCH_ADMISSION_MAX_CONCURRENCY,
+    max_queue=settings.TAG_BATCH_ADMISSION_MAX_QUEUE,
+    queue_timeout_s=settings.TAG_BATCH_ADMISSION_QUEUE_TIMEOUT_S,
+)
+# Semantic cache embeddings run before chat admission; they are never queued,
+# so a burst sheds lookups (treated as misses) rather than sending them all.
+SEMANTIC_CACHE_ADMISSION = AdmissionPool(
+    "semantic_cache",
+    max_concurrency=settings.SEMANTIC_CACHE_MAX_CONCURRENCY,
+    max_queue=0,
+    queue_timeout_s=0.0,
+)
+CHAT_ADMISSION = AdmissionPool(
+    "chat",
+    max_concurrency=settings.CHAT_ADMISSION_MAX_CONCURRENCY,
+    max_queue=settings.CHAT_ADMISSION_MAX_QUEUE,
+    queue_timeout_s=settings.CHAT_ADMISSION_QUEUE_TIMEOUT_S,
+    weights=settings.CHAT_PLAN_WEIGHTS,
+)
@@ -0,0 +1,362 @@
+from typing import (
+    Annotated, Any, AsyncIterator, Awaitable, Callable, Dict, List, Literal, Optional, Tuple, Union,
+    get_args, get_origin, get_type_hints,
+)
+import asyncio
+import hashlib
+import inspect
+import types
+
+from google.genai import types as genai_types
+from pydantic import create_model
+
+from .analytics import compute_trade_analytics
+from .config import settings
+from .data_fetcher import DataFetchError, get_data_fetcher
+from .llm_client import AsyncLLMClient
+from .metrics import span
+
+
+class ToolContext:
+    """
+    Request-scoped values passed to every tool. Identity comes from the
+    authenticated request, never from model-supplied arguments.
+    """
+
+    def __init__(self, user_id: str, session_id: Optional[str] = None):
+        self.user_id = user_id
+        self.session_id = session_id
+
+
+class ToolBudgetExceeded(Exception):
+    """Raised when the tool loop runs past TOOL_LATENCY_BUDGET_S."""
+
+
+# =====================================================================
+# 1. TOOL REGISTRY
+# =====================================================================
+
+_PRIMITIVE_TYPES = {
+    str: genai_types.Type.STRING,
+    int: genai_types.Type.INTEGER,
+    float: genai_types.Type.NUMBER,
+    bool: genai_types.Type.BOOLEAN,
+}
+
+def _schema_for(annotation: Any, description: Optional[str] = None) -> genai_types.Schema:
+    """Builds a Gemini `Schema` from a Python type hint."""
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+
+    if origin is Annotated:
+        extra = next((a for a in args[1:] if isinstance(a, str)), description)
+        return _schema_for(args[0], extra)
+    if origin in (Union, types.UnionType):
+        non_null = [a for a in args if a is not type(None)]
+        schema = _schema_for(non_null[0], description)
+        schema.nullable = len(non_null) < len(args)
+        return schema
+    if origin is Literal:
+        return genai_types.Schema(
+            type=genai_types.Type.STRING, enum=[str(a) for a in args], description=description
+        )
+    if origin in (list, List):
+        item = args[0] if args else str
+        return genai_types.Schema(type=genai_types.Type.ARRAY, items=_schema_for(item), description=description)
+    if origin in (dict, Dict) or annotation is dict:
+        return genai_types.Schema(type=genai_types.Type.OBJECT, description=description)
+    if annotation in _PRIMITIVE_TYPES:
+        return genai_types.Schema(type=_PRIMITIVE_TYPES[annotation], description=description)
+    raise TypeError(f"Unsupported tool parameter type: {annotation!r}")
+
+class RegisteredTool:
+    """A tool function plus the declaration and argument model derived from its signature."""
+
+    def __init__(self, func: Callable[..., Awaitable[Dict[str, Any]]], name: str, description: str):
+        self.func = func
+        self.name = name
+        self.description = description
+
+        hints = get_type_hints(func, include_extras=True)
+        properties: Dict[str, genai_types.Schema] = {}
+        required: List[str] = []
+        fields: Dict[str, Any] = {}
+        self._context_param: Optional[str] = None
+
+        for param in inspect.signature(func).parameters.values():
+            annotation = hints.get(param.name, str)
+            if annotation is ToolContext:
+                self._context_param = param.name
+                continue
+            properties[param.name] = _schema_for(annotation)
+            if param.default is inspect.Parameter.empty:
+                required.append(param.name)
+                fields[param.name] = (annotation, ...)
+            else:
+                fields[param.name] = (annotation, param.default)
+
+        self.declaration = genai_types.FunctionDeclaration(
+            name=name,
+            description=description,
+            parameters=genai_types.Schema(
+                type=genai_types.Type.OBJECT, properties=properties, required=required
+            ) if properties else None,
+        )
+        self._args_model = create_model(f"{name}_args", **fields)
+
+    async def __call__(self, context: ToolContext, args: Dict[str, Any]) -> Dict[str, Any]:
+        kwargs = self._args_model.model_validate(args).model_dump()
+        if self._context_param:
+            kwargs[self._context_param] = context
+        return await self.func(**kwargs)
+
+class ToolRegistry:
+    """
+    Async tools registered by decorator. Declarations are generated once at
+    registration; dispatch is a dict lookup by name.
+    """
+
+    def __init__(self):
+        self._tools: Dict[str, RegisteredTool] = {}
+        self._tool_config: Optional[genai_types.Tool] = None
+        self._fingerprint: Optional[str] = None
+
+    def register(self, name: Optional[str] = None, description: Optional[str] = None):
+        def decorator(func):
+            tool_name = name or func.__name__
+            if tool_name in self._tools:
+                raise ValueError(f"Tool '{tool_name}' is already registered.")
+            doc = description or inspect.cleandoc(func.__doc__ or "").split("\n\n")[0].replace("\n", " ")
+            self._tools[tool_name] = RegisteredTool(func, tool_name, doc)
+            self._tool_config = None
+            self._fingerprint = None
+            return func
+        return decorator
+
+    def get(self, name: str) -> Optional[RegisteredTool]:
+        return self._tools.get(name)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._tools)
+
+    @property
+    def tool_config(self) -> genai_types.Tool:
+        """The `Tool` sent to Gemini, rebuilt only after a new registration."""
+        if self._tool_config is None:
+            self._tool_config = genai_types.Tool(
+                function_declarations=[t.declaration for t in self._tools.values()]
+            )
+        return self._tool_config
+
+    @property
+    def fingerprint(self) -> str:
+        """Short hash of the declarations; part of cache keys that embed the tools."""
+        if self._fingerprint is None:
+            material = self.tool_config.model_dump_json(exclude_none=True)
+            self._fingerprint = hashlib.sha256(material.encode("utf-8")).hexdigest()[:12]
+        return self._fingerprint
+
+TOOL_REGISTRY = ToolRegistry()
+tool = TOOL_REGISTRY.register
+
+
+# =====================================================================
+# 2. TOOLS
+# =====================================================================
+
+@tool(description="Use this tool to fetch the user's current, anonymized trading performance statistics (win rate, expectancy, profit factor, drawdown, streaks, and P/L by symbol, direction, weekday and tag) to answer analytical questions.")
+async def get_user_trade_summary(context: ToolContext) -> Dict[str, Any]:
+    """
+    Fetches the user's anonymized trades and returns precomputed statistics,
+    so the model reasons over exact numbers instead of raw rows.
+    """
+    fetcher = get_data_fetcher()
+    try:
+        trades = await fetcher.get_user_trades(context.user_id)
+    except DataFetchError as e:
+        print(f"DATA FETCH ERROR: Could not load trades for {context.user_id}. Error: {e}")
+        trades = fetcher.get_stale_trades(context.user_id)
+        if trades is None:
+            return {"error": "Trade data is temporarily unavailable. Tell the user their data could not be loaded right now."}
+        return {
+            **compute_trade_analytics(trades),
+            "notice": "Live trade data is unavailable; these statistics may be outdated. Mention this to the user.",
+        }
+
+    return compute_trade_analytics(trades)
+
+
+# =====================================================================
+# 3. TOOL EXECUTION LOOP
+# =====================================================================
+
+async def _execute_call(call: genai_types.FunctionCall, context: ToolContext, timeout: float) -> genai_types.Part:
+    """Runs one function call; failures are reported back to the model, not raised."""
+    handler = TOOL_REGISTRY.get(call.name)
+    if handler is None:
+        response = {"error": f"Unknown tool '{call.name}'."}
+    else:
+        try:
+            response = {"output": await asyncio.wait_for(handler(context, dict(call.args or {})), timeout)}
+        except asyncio.TimeoutError:
+            response = {"error": f"Tool '{call.name}' timed out."}
+        except Exception as e:
+            response = {"error": f"Tool '{call.name}' failed: {e}"}
+
+    return genai_types.Part(
+        function_response=genai_types.FunctionResponse(id=call.id, name=call.name, response=response)
+    )
+
+async def execute_function_calls(
+    calls: List[genai_types.FunctionCall],
+    context: ToolContext,
+    timeout: Optional[float] = None,
+) -> genai_types.Content:
+    """Executes every function call of a turn concurrently and packs the responses into one Content."""
+    timeout = settings.TOOL_CALL_TIMEOUT_S if timeout is None else min(timeout, settings.TOOL_CALL_TIMEOUT_S)
+    parts = await asyncio.gather(*(_execute_call(call, context, timeout) for call in calls))
+    return genai_types.Content(role="tool", parts=list(parts))
+
+def _final_round(
+    contents: List[genai_types.Content],
+    config: genai_types.GenerateContentConfig,
+    added: int,
+    uncached: Optional[Tuple[List[genai_types.Content], genai_types.GenerateContentConfig]],
+) -> Tuple[List[genai_types.Content], genai_types.GenerateContentConfig]:
+    """
+    Contents and config for the round after the limit is hit, where the model
+    must answer in text. Tool config is part of cached content and cannot be
+    overridden per request, so a cached turn falls back to the full `uncached`
+    request plus the last `added` contents (the tool rounds so far).
+    """
+    if config.cached_content:
+        if uncached is None:
+            return contents, config
+        contents = uncached[0] + (contents[-added:] if added else [])
+        config = uncached[1]
+    return contents, config.model_copy(update={
+        "tool_config": genai_types.ToolConfig(
+            function_calling_config=genai_types.FunctionCallingConfig(
+                mode=genai_types.FunctionCallingConfigMode.NONE
+            )
+        )
+    })
+
+class _Deadline:
+    def __init__(self, budget_s: float):
+        self._loop = asyncio.get_running_loop()
+        self._deadline = self._loop.time() + budget_s
+
+    def remaining(self) -> float:
+        remaining = self._deadline - self._loop.time()
+        if remaining <= 0:
+            raise ToolBudgetExceeded("Tool-calling latency budget exhausted.")
+        return remaining
+
+async def run_tool_loop(
+    llm: AsyncLLMClient,
+    contents: List[genai_types.Content],
+    config: genai_types.GenerateContentConfig,
+    context: ToolContext,
+    max_rounds: Optional[int] = None,
+    budget_s: Optional[float] = None,
+    uncached: Optional[Tuple[List[genai_types.Content], genai_types.GenerateContentConfig]] = None,
+) -> Tuple[genai_types.GenerateContentResponse, List[str]]:
+    """
+    Generates, executes all requested function calls in parallel, and feeds
+    the results back, for up to `max_rounds` tool rounds within `budget_s`.
+    Returns the final response and the names of the tools that were called.
+    When `config` uses a context cache, pass the `uncached` request (see
+    `context_cache.uncached_turn`) so the final round can disable tools.
+    """
+    max_rounds = settings.TOOL_MAX_ROUNDS if max_rounds is None else max_rounds
+    deadline = _Deadline(settings.TOOL_LATENCY_BUDGET_S if budget_s is None else budget_s)
+    contents = list(contents)
+    initial = len(contents)
+    called: List[str] = []
+
+    for round_index in range(max_rounds + 1):
+        round_contents, round_config = (
+            (contents, config) if round_index < max_rounds
+            else _final_round(contents, config, len(contents) - initial, uncached)
+        )
+        # Checked before the call is created, so a spent budget leaves no un-awaited coroutine.
+        timeout = deadline.remaining()
+        try:
+            with span(f"gemini_call_{round_index + 1}"):
+                response = await asyncio.wait_for(
+                    llm.generate_content(contents=round_contents, config=round_config), timeout
+                )
+        except asyncio.TimeoutError:
+            raise ToolBudgetExceeded("Tool-calling latency budget exhausted.")
+
+        calls = response.function_calls
+        if not calls or round_index == max_rounds:
+            return response, called
+
+        called.extend(call.name for call in calls)
+        contents.append(response.candidates[0].content)
+        with span("tool_execution"):
+            contents.append(await execute_function_calls(calls, context, deadline.remaining()))
+
+    return response, called
+
+async def stream_tool_loop(
+    llm: AsyncLLMClient,
+    contents: List[genai_types.Content],
+    config: genai_types.GenerateContentConfig,
+    context: ToolContext,
+    max_rounds: Optional[int] = None,
+    budget_s: Optional[float] = None,
+    uncached: Optional[Tuple[List[genai_types.Content], genai_types.GenerateContentConfig]] = None,
+) -> AsyncIterator[Tuple[str, str]]:
+    """
+    Streaming counterpart of `run_tool_loop`. Yields ("token", text) as text
+    arrives and ("tool_call", name) when a round's calls are dispatched.
+    """
+    max_rounds = settings.TOOL_MAX_ROUNDS if max_rounds is None else max_rounds
+    deadline = _Deadline(settings.TOOL_LATENCY_BUDGET_S if budget_s is None else budget_s)
+    contents = list(contents)
+    initial = len(contents)
+
+    for round_index in range(max_rounds + 1):
+        round_contents, round_config = (
+            (contents, config) if round_index < max_rounds
+            else _final_round(contents, config, len(contents) - initial, uncached)
+        )
+        calls: List[genai_types.FunctionCall] = []
+        model_parts: List[genai_types.Part] = []
+
+        deadline.remaining()
+        stream = llm.generate_content_stream(contents=round_contents, config=round_config)
+        with span(f"gemini_call_{round_index + 1}"):
+            try:
+                while True:
+                    # Each chunk must arrive within the budget, so a stalled stream cannot overrun it.
+                    timeout = deadline.remaining()
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        raise ToolBudgetExceeded("Tool-calling latency budget exhausted.")
+                    if not chunk.candidates or not chunk.candidates[0].content:
+                        continue
+                    for part in chunk.candidates[0].content.parts or []:
+                        model_parts.append(part)
+                        if part.function_call:
+                            calls.append(part.function_call)
+                        elif part.text and not part.thought:
+                            yield "token", part.text
+            finally:
+                await stream.aclose()
+
+        if not calls or round_index == max_rounds:
+            return
+
+        for call in calls:
+            yield "tool_call", call.name
+        contents.append(genai_types.Content(role="model", parts=model_parts))
+        with span("tool_execution"):
+            contents.append(await execute_function_calls(calls, context, deadline.remaining()))
@@ -0,0 +1,163 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+from ..schemas.llm_schemas import TradeSummary
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Breakdown tables are capped to keep the tool output (and the prompt) small.
+MAX_GROUPS_PER_BREAKDOWN = 15
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    return value.timestamp() if value is not None else np.nan
+
+
+def _r(value: float, digits: int = 2) -> Any:
+    """Rounds for JSON output; NaN/inf become None."""
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def _group_stats(
+    codes: np.ndarray,
+    labels: Sequence[str],
+    pnl: np.ndarray,
+    wins: np.ndarray,
+    limit: int = MAX_GROUPS_PER_BREAKDOWN,
+) -> Dict[str, Dict[str, Any]]:
+    """Per-group trade count, net P/L and win rate over closed trades."""
+    n = len(labels)
+    counts = np.bincount(codes, minlength=n)
+    net = np.bincount(codes, weights=pnl, minlength=n)
+    won = np.bincount(codes, weights=wins, minlength=n)
+
+    order = np.argsort(-counts, kind="stable")[:limit]
+    return {
+        labels[i]: {
+            "trades": int(counts[i]),
+            "net_pnl": _r(net[i]),
+            "win_rate": _r(won[i] / counts[i], 4),
+        }
+        for i in order
+        if counts[i]
+    }
+
+
+def _streaks(outcomes: np.ndarray) -> Dict[str, Any]:
+    """Longest winning/losing runs and the current run, from an ordered +1/-1/0 array."""
+    if outcomes.size == 0:
+        return {"longest_win_streak": 0, "longest_loss_streak": 0, "current_streak": 0}
+
+    change = np.flatnonzero(np.diff(outcomes)) + 1
+    starts = np.concatenate(([0], change))
+    lengths = np.diff(np.concatenate((starts, [outcomes.size])))
+    run_values = outcomes[starts]
+
+    win_runs = lengths[run_values > 0]
+    loss_runs = lengths[run_values < 0]
+    return {
+        "longest_win_streak": int(win_runs.max()) if win_runs.size else 0,
+        "longest_loss_streak": int(loss_runs.max()) if loss_runs.size else 0,
+        # Positive for a winning run, negative for a losing run.
+        "current_streak": int(lengths[-1] * run_values[-1]),
+    }
+
+
+def compute_trade_analytics(trades: List[TradeSummary]) -> Dict[str, Any]:
+    """
+    Turns a user's trade list into exact performance statistics in one
+    vectorized pass: win rate, expectancy, profit factor, drawdown, streaks
+    and P/L broken down by symbol, direction, weekday and tag. Only closed
+    trades (with a P/L) count towards the performance figures.
+    """
+    total = len(trades)
+    if total == 0:
+        return {"total_trades": 0, "closed_trades": 0, "open_trades": 0}
+
+    pnl_all = np.array([np.nan if t.pnl is None else t.pnl for t in trades], dtype=np.float64)
+    closed = ~np.isnan(pnl_all)
+    n_closed = int(closed.sum())
+    stats: Dict[str, Any] = {
+        "total_trades": total,
+        "closed_trades": n_closed,
+        "open_trades": total - n_closed,
+    }
+    if n_closed == 0:
+        return stats
+
+    closed_idx = np.flatnonzero(closed)
+    pnl = pnl_all[closed_idx]
+    is_win = pnl > 0
+    is_loss = pnl < 0
+    wins = is_win.astype(np.float64)
+
+    gross_profit = pnl[is_win].sum()
+    gross_loss = pnl[is_loss].sum()
+    n_wins = int(is_win.sum())
+    n_losses = int(is_loss.sum())
+
+    # Equity curve in chronological order (exit time, falling back to entry time).
+    closed_trades = [trades[i] for i in closed_idx]
+    entry_times = [_parse_datetime(t.entry_datetime) for t in closed_trades]
+    times = np.array(
+        [
+            _timestamp(_parse_datetime(t.exit_datetime) or entry)
+            for t, entry in zip(closed_trades, entry_times)
+        ],
+        dtype=np.float64,
+    )
+    chrono = np.argsort(np.nan_to_num(times, nan=np.inf), kind="stable")
+    equity = np.cumsum(pnl[chrono])
+    peak = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:]
+    drawdown = equity - peak
+    trough = int(np.argmin(drawdown))
+
+    stats.update({
+        "wins": n_wins,
+        "losses": n_losses,
+        "breakeven": n_closed - n_wins - n_losses,
+        "win_rate": _r(n_wins / n_closed, 4),
+        "net_pnl": _r(pnl.sum()),
+        "gross_profit": _r(gross_profit),
+        "gross_loss": _r(gross_loss),
+        "avg_win": _r(gross_profit / n_wins) if n_wins else None,
+        "avg_loss": _r(gross_loss / n_losses) if n_losses else None,
+        "expectancy": _r(pnl.mean()),
+        "profit_factor": _r(gross_profit / -gross_loss) if n_losses else None,
+        "largest_win": _r(pnl.max()) if n_wins else None,
+        "largest_loss": _r(pnl.min()) if n_losses else None,
+        "max_drawdown": _r(drawdown[trough]),
+        "max_drawdown_trade_index": trough + 1,
+    })
+    stats.update(_streaks(np.sign(pnl[chrono]).astype(np.int8)))
+
+    # --- Breakdowns ---
+    symbols, symbol_codes = np.unique([t.symbol for t in closed_trades], return_inverse=True)
+    directions, direction_codes = np.unique(
+        [t.direction.lower() for t in closed_trades], return_inverse=True
+    )
+    weekday_codes = np.array([7 if ts is None else ts.weekday() for ts in entry_times], dtype=np.int64)
+
+    tag_rows = [(i, tag) for i, t in enumerate(closed_trades) for tag in t.tags]
+    stats["by_symbol"] = _group_stats(symbol_codes.ravel(), symbols.tolist(), pnl, wins)
+    stats["by_direction"] = _group_stats(direction_codes.ravel(), directions.tolist(), pnl, wins)
+    stats["by_weekday"] = _group_stats(weekday_codes, WEEKDAYS + ["Unknown"], pnl, wins, limit=8)
+
+    if tag_rows:
+        tag_trade_idx = np.fromiter((i for i, _ in tag_rows), dtype=np.int64, count=len(tag_rows))
+        tags, tag_codes = np.unique([tag for _, tag in tag_rows], return_inverse=True)
+        stats["by_tag"] = _group_stats(
+            tag_codes.ravel(), tags.tolist(), pnl[tag_trade_idx], wins[tag_trade_idx]
+        )
+    else:
+        stats["by_tag"] = {}
+
+    return stats
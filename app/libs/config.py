@@ -1,13 +1,99 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     # ----------------------------------------------------------------------
     # Core Application & LLM Settings
     # ----------------------------------------------------------------------
     PORT: int = 8001
+    HOST: str = "0.0.0.0"
     GEMINI_API_KEY: str
     GEMINI_MODEL: str = "gemini-2.5-flash"
+    EMBEDDING_MODEL: str = "gemini-embedding-001"
+    # Truncated embedding size (Matryoshka); smaller vectors make lookups cheaper
+    EMBEDDING_DIMENSIONS: int = 256
+    # Active prompt template versions (see app/libs/prompts.py); switch to A/B a new version
+    CHAT_PROMPT_VERSION: str = "v1"
+    TAGGING_PROMPT_VERSION: str = "v1"
+    BATCH_TAGGING_PROMPT_VERSION: str = "v1"
+    HISTORY_SUMMARY_PROMPT_VERSION: str = "v1"
+    # Plan tiers with their own chat prompt and scheduling tier, precompiled at
+    # startup; any other user_plan is prompted and scheduled as OTHER_PLAN_TIER,
+    # a generic name that does not claim to be one of the listed plans
+    PLAN_TIERS: List[str] = ["free", "pro"]
+    OTHER_PLAN_TIER: str = "other"
+    # Override the Gemini endpoint (e.g. a local fake server for load tests)
+    GEMINI_BASE_URL: Optional[str] = None
+    GEMINI_TIMEOUT_MS: Optional[int] = 30000
+    # Thread pool size used only when the SDK has no native async surface
+    LLM_EXECUTOR_MAX_WORKERS: int = 16
+    # Retries on 429/5xx/timeouts, full-jitter exponential backoff
+    LLM_MAX_RETRIES: int = 2
+    LLM_BACKOFF_BASE_S: float = 0.25
+    LLM_BACKOFF_MAX_S: float = 4.0
+    # Retries + hedges may add at most this fraction of calls (plus a small burst)
+    LLM_RETRY_BUDGET_RATIO: float = 0.1
+    LLM_RETRY_BUDGET_MAX_TOKENS: float = 10.0
+    # Hedged /tag-trade calls: send a second request once the first exceeds the
+    # recent p95 latency (default delay until enough samples are collected)
+    TAG_HEDGE_ENABLED: bool = True
+    TAG_HEDGE_QUANTILE: float = 0.95
+    TAG_HEDGE_DEFAULT_DELAY_S: float = 1.5
+    TAG_HEDGE_MIN_DELAY_S: float = 0.2
+    
+    # ----------------------------------------------------------------------
+    # Production Server (serve.py)
+    # ----------------------------------------------------------------------
+    # Worker processes; 0 sizes from the CPU count
+    WEB_CONCURRENCY: int = 0
+    SERVER_BACKLOG: int = 2048
+    # Keep idle connections open longer than the upstream load balancer does
+    SERVER_KEEPALIVE_S: int = 75
+    SERVER_GRACEFUL_SHUTDOWN_S: int = 30
+    # Per-worker cap on concurrent connections before answering 503; 0 disables
+    SERVER_LIMIT_CONCURRENCY: int = 0
+    
+    # ----------------------------------------------------------------------
+    # Admission Control (per worker)
+    # ----------------------------------------------------------------------
+    # /tag-trade: latency-sensitive, so queue briefly then shed
+    TAG_ADMISSION_MAX_CONCURRENCY: int = 32
+    TAG_ADMISSION_MAX_QUEUE: int = 64
+    TAG_ADMISSION_QUEUE_TIMEOUT_S: float = 2.0
+    # /tag-trades: one slot per chunk (Gemini call); imports can wait longer
+    TAG_BATCH_ADMISSION_MAX_CONCURRENCY: int = 8
+    TAG_BATCH_ADMISSION_MAX_QUEUE: int = 64
+    TAG_BATCH_ADMISSION_QUEUE_TIMEOUT_S: float = 30.0
+    # /chat/{session_id} and its streaming variant
+    CHAT_ADMISSION_MAX_CONCURRENCY: int = 16
+    CHAT_ADMISSION_MAX_QUEUE: int = 100
+    CHAT_ADMISSION_QUEUE_TIMEOUT_S: float = 10.0
+    # Share of freed chat slots per plan tier under contention; keys are
+    # PLAN_TIERS or OTHER_PLAN_TIER (tiers without a weight count as 1)
+    CHAT_PLAN_WEIGHTS: Dict[str, float] = {"pro": 4.0, "free": 1.0}
+    
+    # ----------------------------------------------------------------------
+    # Circuit Breakers (per worker)
+    # ----------------------------------------------------------------------
+    # Outcomes kept per breaker, and how many are needed before it can trip
+    CIRCUIT_WINDOW: int = 50
+    CIRCUIT_MIN_CALLS: int = 20
+    # Gemini: trip on >=50% transient failures or >=80% calls slower than the threshold
+    LLM_CIRCUIT_FAILURE_RATE: float = 0.5
+    LLM_CIRCUIT_SLOW_CALL_S: float = 30.0
+    LLM_CIRCUIT_OPEN_S: float = 30.0
+    # Main backend (DATA_FETCHER)
+    BACKEND_CIRCUIT_FAILURE_RATE: float = 0.5
+    BACKEND_CIRCUIT_SLOW_CALL_S: float = 3.0
+    BACKEND_CIRCUIT_OPEN_S: float = 15.0
+    # Last successfully fetched trades, served (marked stale) while the backend is down
+    TRADE_STALE_TTL_SECONDS: int = 86400
+    
+    # ----------------------------------------------------------------------
+    # Observability
+    # ----------------------------------------------------------------------
+    # Latency histograms and Gemini token counters served at /metrics
+    METRICS_ENABLED: bool = True
     
     # ----------------------------------------------------------------------
     # Main Backend Communication & Security
@@ -15,6 +101,119 @@ class Settings(BaseSettings):
     MAIN_BACKEND_URL: str
     # Shared secret key that authenticates the main backend to this service
     AI_SERVICE_SECRET_KEY: str 
+    # Internal endpoint returning a user's anonymized trades
+    MAIN_BACKEND_TRADES_PATH: str = "/api/v1/internal/users/{user_id}/trades"
+
+    # ----------------------------------------------------------------------
+    # Data Fetcher (pooled HTTP client to the main backend)
+    # ----------------------------------------------------------------------
+    DATA_FETCHER_MAX_CONNECTIONS: int = 100
+    DATA_FETCHER_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    DATA_FETCHER_KEEPALIVE_EXPIRY_S: float = 30.0
+    DATA_FETCHER_CONNECT_TIMEOUT_S: float = 2.0
+    DATA_FETCHER_READ_TIMEOUT_S: float = 5.0
+    DATA_FETCHER_MAX_RETRIES: int = 2
+    DATA_FETCHER_BACKOFF_BASE_S: float = 0.1
+    DATA_FETCHER_BACKOFF_MAX_S: float = 2.0
+
+    # ----------------------------------------------------------------------
+    # Caching
+    # ----------------------------------------------------------------------
+    # Content-addressed /tag-trade cache (in-process LRU tier)
+    TAG_CACHE_ENABLED: bool = True
+    TAG_CACHE_MAX_ENTRIES: int = 10000
+    TAG_CACHE_TTL_SECONDS: int = 86400
+    # Per-user trade cache used by the chat tools; the main backend invalidates it on edits.
+    # Invalidation only reaches one process, so serve.py sets the TTL to 0 (off) for several workers
+    TRADE_CACHE_MAX_USERS: int = 5000
+    TRADE_CACHE_TTL_SECONDS: int = 300
+    # Semantic cache of chat answers: paraphrased data questions ("what's my
+    # win rate?") reuse an earlier tool-grounded answer while the user's
+    # trade data version is unchanged. That version is per process, so
+    # serve.py turns the cache off when it runs more than one worker
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_MIN_SIMILARITY: float = 0.92
+    SEMANTIC_CACHE_TOP_K: int = 3
+    SEMANTIC_CACHE_MAX_USERS: int = 5000
+    SEMANTIC_CACHE_MAX_ENTRIES_PER_USER: int = 64
+    SEMANTIC_CACHE_TTL_SECONDS: int = 3600
+    # Longer messages are rarely repeated and are not embedded
+    SEMANTIC_CACHE_MAX_MESSAGE_CHARS: int = 300
+    # The lookup is optional: a slow embedding, or more than this many at once
+    # (no queue), counts as a miss instead of delaying the turn
+    SEMANTIC_CACHE_EMBED_TIMEOUT_S: float = 0.3
+    SEMANTIC_CACHE_MAX_CONCURRENCY: int = 8
+
+    # ----------------------------------------------------------------------
+    # Batch Tagging (/tag-trades)
+    # ----------------------------------------------------------------------
+    # Notes packed into a single structured-output Gemini call
+    TAG_BATCH_CHUNK_SIZE: int = 25
+    # Chunks in flight at once per batch request
+    TAG_BATCH_MAX_CONCURRENCY: int = 4
+    
+    # ----------------------------------------------------------------------
+    # Local Pre-Tagger (skips Gemini for formulaic notes)
+    # ----------------------------------------------------------------------
+    PRETAGGER_ENABLED: bool = True
+    # Longer notes always go to the LLM
+    PRETAGGER_MAX_WORDS: int = 16
+    # Share of meaningful words that must be explained by vocabulary phrases
+    PRETAGGER_MIN_COVERAGE: float = 0.6
+
+    # ----------------------------------------------------------------------
+    # Tag Vocabulary (canonicalization of every tagging result)
+    # ----------------------------------------------------------------------
+    # Constrain the model's tags to the canonical vocabulary via response_schema
+    TAG_ENUM_CONSTRAINT: bool = True
+    # Trigram (Dice) similarity needed to map an unknown spelling onto a tag
+    TAG_FUZZY_MIN_SIMILARITY: float = 0.7
+    # Keep tags that match nothing (title-cased) instead of dropping them
+    TAG_KEEP_UNMATCHED: bool = False
+
+    # ----------------------------------------------------------------------
+    # Chat Session Store
+    # ----------------------------------------------------------------------
+    # "memory" (per-process LRU) or "sqlite" (LRU in front of a local file)
+    SESSION_STORE_BACKEND: str = "memory"
+    SESSION_STORE_MAX_SESSIONS: int = 5000
+    SESSION_STORE_TTL_SECONDS: int = 86400
+    SESSION_SQLITE_PATH: str = "sessions.db"
+
+    # ----------------------------------------------------------------------
+    # History Compaction
+    # ----------------------------------------------------------------------
+    # Estimated tokens of history (summary + verbatim turns) sent per turn; 0 disables
+    HISTORY_TOKEN_BUDGET: int = 6000
+    # When over budget, fold older turns until the verbatim tail is this share of the budget
+    HISTORY_COMPACT_TARGET_RATIO: float = 0.6
+    # Most recent messages that are always sent verbatim
+    HISTORY_MIN_RECENT_MESSAGES: int = 6
+    HISTORY_SUMMARY_MAX_TOKENS: int = 400
+
+    # ----------------------------------------------------------------------
+    # Tool Calling
+    # ----------------------------------------------------------------------
+    # Tool rounds per chat turn before the model is forced to answer in text
+    TOOL_MAX_ROUNDS: int = 3
+    # Wall-clock budget for the whole generate/execute loop of one turn
+    TOOL_LATENCY_BUDGET_S: float = 45.0
+    TOOL_CALL_TIMEOUT_S: float = 10.0
+
+    # ----------------------------------------------------------------------
+    # Gemini Context Caching
+    # ----------------------------------------------------------------------
+    CONTEXT_CACHE_ENABLED: bool = True
+    CONTEXT_CACHE_TTL_SECONDS: int = 3600
+    # Extend a cache handle when it is this close to expiring
+    CONTEXT_CACHE_REFRESH_MARGIN_SECONDS: int = 300
+    # Provider minimum for explicit caching; smaller prompts are sent uncached
+    CONTEXT_CACHE_MIN_TOKENS: int = 1024
+    # Recreate a session cache once this many messages sit outside it
+    CONTEXT_CACHE_MAX_UNCACHED_MESSAGES: int = 20
+    CONTEXT_CACHE_MAX_ENTRIES: int = 1000
+    # After a failed create, skip caching for that key for this long
+    CONTEXT_CACHE_FAILURE_COOLDOWN_SECONDS: int = 300
     
     # ----------------------------------------------------------------------
     # Pydantic Settings Configuration
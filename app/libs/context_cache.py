@@ -0,0 +1,208 @@
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import time
+
+from google.genai import types as genai_types
+
+from .cache import TTLCache
+from .config import settings
+from .history import estimate_content_tokens, estimate_tokens
+from .llm_client import AsyncLLMClient
+
+
+def _fingerprint(contents: List[genai_types.Content]) -> int:
+    return hash(tuple(
+        (content.role, tuple(part.text for part in content.parts or []))
+        for content in contents
+    ))
+
+
+def uncached_turn(
+    system_instruction: genai_types.Content,
+    tools: List[genai_types.Tool],
+    history: List[genai_types.Content],
+    new_contents: List[genai_types.Content],
+) -> Tuple[List[genai_types.Content], genai_types.GenerateContentConfig]:
+    """The full request for a turn, without any context cache."""
+    return (
+        history + new_contents,
+        genai_types.GenerateContentConfig(system_instruction=system_instruction, tools=tools),
+    )
+
+
+class CachedContext:
+    """A provider-side cache handle plus what it covers."""
+
+    __slots__ = ("name", "expires_at", "prefix_len", "fingerprint")
+
+    def __init__(self, name: str, expires_at: float, prefix_len: int = 0, fingerprint: int = 0):
+        self.name = name
+        self.expires_at = expires_at
+        self.prefix_len = prefix_len
+        self.fingerprint = fingerprint
+
+
+class ContextCacheManager:
+    """
+    Reuses Gemini cached content so the TradeLM system instruction, tool
+    declarations and long history prefixes are not resent (and rebilled)
+    on every turn.
+
+    - Per plan: system instruction + tools, shared by every session on that plan.
+    - Per session: system instruction + tools + the history prefix. Later
+      turns send only the messages appended since the cache was created,
+      until that delta exceeds CONTEXT_CACHE_MAX_UNCACHED_MESSAGES.
+
+    Handles are extended shortly before expiry. Anything below the provider's
+    minimum cacheable size, or any cache API failure, falls back to the
+    regular uncached request (failures are remembered for a cool-down).
+    """
+
+    def __init__(self):
+        self._entries: TTLCache[CachedContext] = TTLCache(
+            max_entries=settings.CONTEXT_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.CONTEXT_CACHE_TTL_SECONDS,
+            name="context_cache",
+        )
+        self._failures: TTLCache[bool] = TTLCache(
+            max_entries=settings.CONTEXT_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.CONTEXT_CACHE_FAILURE_COOLDOWN_SECONDS,
+            name="context_cache_failures",
+        )
+        self._locks: Dict[Tuple, asyncio.Lock] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _safe_delete(self, llm: AsyncLLMClient, name: str) -> None:
+        try:
+            await llm.delete_cached_content(name)
+        except Exception:
+            pass
+
+    async def _fresh(self, llm: AsyncLLMClient, entry: CachedContext) -> bool:
+        """Extends the handle if it is close to expiry. False if it can no longer be used."""
+        remaining = entry.expires_at - time.monotonic()
+        if remaining > settings.CONTEXT_CACHE_REFRESH_MARGIN_SECONDS:
+            return True
+        if remaining <= 0:
+            return False
+        try:
+            await llm.update_cached_content(entry.name, settings.CONTEXT_CACHE_TTL_SECONDS)
+        except Exception:
+            return False
+        entry.expires_at = time.monotonic() + settings.CONTEXT_CACHE_TTL_SECONDS
+        return True
+
+    async def _create(
+        self,
+        llm: AsyncLLMClient,
+        key: Tuple,
+        system_instruction: genai_types.Content,
+        tools: List[genai_types.Tool],
+        prefix: List[genai_types.Content],
+    ) -> Optional[CachedContext]:
+        if self._failures.get(key):
+            return None
+        try:
+            cached = await llm.create_cached_content(
+                genai_types.CreateCachedContentConfig(
+                    display_name=":".join(str(k) for k in key)[:128],
+                    system_instruction=system_instruction,
+                    tools=tools,
+                    contents=prefix or None,
+                    ttl=f"{settings.CONTEXT_CACHE_TTL_SECONDS}s",
+                )
+            )
+        except Exception as e:
+            print(f"CONTEXT CACHE WARNING: Falling back to uncached requests for {key[0]}. Error: {e}")
+            self._failures.set(key, True)
+            return None
+
+        entry = CachedContext(
+            name=cached.name,
+            expires_at=time.monotonic() + settings.CONTEXT_CACHE_TTL_SECONDS,
+            prefix_len=len(prefix),
+            fingerprint=_fingerprint(prefix),
+        )
+        self._entries.set(key, entry)
+        return entry
+
+    async def _lookup(
+        self,
+        llm: AsyncLLMClient,
+        key: Tuple,
+        system_instruction: genai_types.Content,
+        tools: List[genai_types.Tool],
+        history: List[genai_types.Content],
+    ) -> Optional[CachedContext]:
+        if len(self._locks) > 2 * settings.CONTEXT_CACHE_MAX_ENTRIES:
+            self._locks = {k: l for k, l in self._locks.items() if l.locked()}
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                reusable = (
+                    entry.prefix_len <= len(history)
+                    and len(history) - entry.prefix_len <= settings.CONTEXT_CACHE_MAX_UNCACHED_MESSAGES
+                    and entry.fingerprint == _fingerprint(history[:entry.prefix_len])
+                )
+                if reusable and await self._fresh(llm, entry):
+                    # Re-set so the local entry lives as long as the extended handle.
+                    self._entries.set(key, entry)
+                    return entry
+                self._entries.pop(key)
+                self._spawn(self._safe_delete(llm, entry.name))
+
+            return await self._create(llm, key, system_instruction, tools, history)
+
+    async def prepare(
+        self,
+        llm: AsyncLLMClient,
+        session_id: str,
+        plan_key: str,
+        system_instruction: genai_types.Content,
+        tools: List[genai_types.Tool],
+        history: List[genai_types.Content],
+        new_contents: List[genai_types.Content],
+    ) -> Tuple[List[genai_types.Content], genai_types.GenerateContentConfig]:
+        """
+        Returns the contents and config for a turn: either a cache handle plus
+        only the uncached tail, or the full request when caching does not apply.
+        """
+        uncached = uncached_turn(system_instruction, tools, history, new_contents)
+        if not settings.CONTEXT_CACHE_ENABLED:
+            return uncached
+
+        model = llm.model
+        base_tokens = estimate_content_tokens([system_instruction]) + estimate_tokens(str(tools))
+        if base_tokens + estimate_content_tokens(history) >= settings.CONTEXT_CACHE_MIN_TOKENS and history:
+            entry = await self._lookup(llm, ("session", model, session_id, plan_key), system_instruction, tools, history)
+            if entry is not None:
+                return (
+                    history[entry.prefix_len:] + new_contents,
+                    genai_types.GenerateContentConfig(cached_content=entry.name),
+                )
+
+        if base_tokens >= settings.CONTEXT_CACHE_MIN_TOKENS:
+            entry = await self._lookup(llm, ("plan", model, plan_key), system_instruction, tools, [])
+            if entry is not None:
+                return (
+                    history + new_contents,
+                    genai_types.GenerateContentConfig(cached_content=entry.name),
+                )
+
+        return uncached
+
+    async def drop_session(self, llm: AsyncLLMClient, session_id: str) -> None:
+        """Deletes provider-side caches belonging to a session."""
+        for key in [k for k in self._entries.keys() if k[0] == "session" and k[2] == session_id]:
+            entry = self._entries.pop(key)
+            if entry is not None:
+                await self._safe_delete(llm, entry.name)
+
+
+CONTEXT_CACHE = ContextCacheManager()
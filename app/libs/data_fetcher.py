@@ -0,0 +1,225 @@
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+import asyncio
+import time
+
+import httpx
+
+from ..schemas.llm_schemas import TradeSummary
+from .cache import TTLCache
+from .config import settings
+from .resilience import RETRYABLE_STATUS_CODES, CircuitBreaker, CircuitOpenError, backoff_delay
+
+
+class DataFetchError(Exception):
+    """Raised when trade data cannot be fetched from the main backend."""
+
+
+class DataFetcher:
+    """
+    Async client for the main backend's internal data API.
+
+    A single pooled `httpx.AsyncClient` (keep-alive, bounded connections) is
+    opened by `start()` during app startup and closed by `aclose()` on shutdown.
+    Transient failures are retried with full-jitter exponential backoff, and
+    every attempt goes through a circuit breaker so a degraded backend fails
+    fast instead of holding requests for the full timeout.
+
+    Trades are cached per user for TRADE_CACHE_TTL_SECONDS; the main backend
+    calls the invalidation endpoint when a user's trades change, which drops
+    the entry and bumps that user's data version. Concurrent misses for the
+    same user share one upstream request. The last successful result per user
+    is also kept for `stale_ttl_seconds` (surviving invalidation) so tools
+    can fall back to it while the backend is unavailable.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        auth_key: str,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 2.0,
+        read_timeout: float = 5.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.1,
+        backoff_max: float = 2.0,
+        cache_max_users: int = 5000,
+        cache_ttl_seconds: float = 300,
+        stale_ttl_seconds: float = 86400,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url
+        self._auth_key = auth_key
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self.trades_cache: TTLCache[List[TradeSummary]] = TTLCache(
+            max_entries=cache_max_users,
+            ttl_seconds=cache_ttl_seconds,
+            name="trade_cache",
+        )
+        self.stale_trades: TTLCache[List[TradeSummary]] = TTLCache(
+            max_entries=cache_max_users,
+            ttl_seconds=stale_ttl_seconds,
+            name="stale_trade_cache",
+        )
+        self.breaker = breaker or CircuitBreaker("main_backend")
+        self._data_versions: Dict[str, int] = {}
+        self._inflight: Dict[str, "asyncio.Task[List[TradeSummary]]"] = {}
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self._limits,
+                timeout=self._timeout,
+                headers={"X-Microservice-Auth": self._auth_key},
+            )
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get_json(self, path: str, timeout: Optional[float] = None) -> Any:
+        if self._client is None:
+            # Allows use outside the app lifespan (scripts, one-off jobs).
+            await self.start()
+
+        request_timeout = httpx.Timeout(timeout) if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(backoff_delay(attempt - 1, self.backoff_base, self.backoff_max))
+            try:
+                self.breaker.allow()
+            except CircuitOpenError as e:
+                raise DataFetchError(str(e)) from e
+
+            start = time.monotonic()
+            try:
+                response = await self._client.get(path, timeout=request_timeout)
+            except httpx.TransportError as e:
+                self.breaker.record(True, time.monotonic() - start)
+                last_error = e
+                continue
+            except BaseException:
+                self.breaker.cancel()
+                raise
+
+            self.breaker.record(response.status_code in RETRYABLE_STATUS_CODES, time.monotonic() - start)
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                last_error = DataFetchError(f"Main backend returned {response.status_code} for {path}")
+                continue
+            if response.is_error:
+                raise DataFetchError(f"Main backend returned {response.status_code} for {path}")
+            return response.json()
+
+        raise DataFetchError(f"Main backend request failed after {self.max_retries + 1} attempts: {last_error}")
+
+    async def _fetch_user_trades(self, user_id: str, timeout: Optional[float]) -> List[TradeSummary]:
+        path = settings.MAIN_BACKEND_TRADES_PATH.format(user_id=quote(user_id, safe=""))
+        payload = await self._get_json(path, timeout=timeout)
+        if isinstance(payload, dict):
+            payload = payload.get("trades", [])
+        return [TradeSummary.model_validate(item) for item in payload]
+
+    async def get_user_trades(
+        self,
+        user_id: str,
+        timeout: Optional[float] = None,
+        use_cache: bool = True,
+    ) -> List[TradeSummary]:
+        """Fetches the user's anonymized trades as typed `TradeSummary` rows."""
+        if not use_cache:
+            return await self._fetch_user_trades(user_id, timeout)
+
+        cached = self.trades_cache.get(user_id)
+        if cached is not None:
+            return cached
+
+        # The shared fetch runs in its own task and every caller, the first one
+        # included, awaits it through a shield: a cancelled caller (client
+        # disconnect, tool timeout) stops waiting without cancelling the others.
+        inflight = self._inflight.get(user_id)
+        if inflight is None:
+            inflight = asyncio.ensure_future(
+                self._fetch_and_cache(user_id, timeout, self.data_version(user_id))
+            )
+            # Mark retrieved so a failure nobody is still waiting for does not log a warning.
+            inflight.add_done_callback(lambda task: task.cancelled() or task.exception())
+            self._inflight[user_id] = inflight
+        return await asyncio.shield(inflight)
+
+    async def _fetch_and_cache(self, user_id: str, timeout: Optional[float], version: int) -> List[TradeSummary]:
+        try:
+            trades = await self._fetch_user_trades(user_id, timeout)
+        finally:
+            # An invalidation may already have replaced this fetch with a newer one.
+            if self._inflight.get(user_id) is asyncio.current_task():
+                del self._inflight[user_id]
+        # Skip caching if the trades were invalidated while in flight, or if the cache is off (TTL 0).
+        if self.data_version(user_id) == version and self.trades_cache.ttl_seconds > 0:
+            self.trades_cache.set(user_id, trades)
+        self.stale_trades.set(user_id, trades)
+        return trades
+
+    def get_stale_trades(self, user_id: str) -> Optional[List[TradeSummary]]:
+        """Last successfully fetched trades, possibly outdated. For degraded responses only."""
+        return self.stale_trades.get(user_id)
+
+    def data_version(self, user_id: str) -> int:
+        """Monotonic counter bumped every time the user's trades are invalidated."""
+        return self._data_versions.get(user_id, 0)
+
+    def invalidate_user(self, user_id: str) -> int:
+        """
+        Drops the user's cached trades and returns their new data version. A
+        fetch already in flight is detached so later callers start a fresh one;
+        its current waiters still get its result, which is not cached.
+        """
+        self.trades_cache.pop(user_id)
+        self._inflight.pop(user_id, None)
+        version = self.data_version(user_id) + 1
+        self._data_versions[user_id] = version
+        return version
+
+
+DATA_FETCHER = DataFetcher(
+    base_url=settings.MAIN_BACKEND_URL,
+    auth_key=settings.AI_SERVICE_SECRET_KEY,
+    max_connections=settings.DATA_FETCHER_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.DATA_FETCHER_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=settings.DATA_FETCHER_KEEPALIVE_EXPIRY_S,
+    connect_timeout=settings.DATA_FETCHER_CONNECT_TIMEOUT_S,
+    read_timeout=settings.DATA_FETCHER_READ_TIMEOUT_S,
+    max_retries=settings.DATA_FETCHER_MAX_RETRIES,
+    backoff_base=settings.DATA_FETCHER_BACKOFF_BASE_S,
+    backoff_max=settings.DATA_FETCHER_BACKOFF_MAX_S,
+    cache_max_users=settings.TRADE_CACHE_MAX_USERS,
+    cache_ttl_seconds=settings.TRADE_CACHE_TTL_SECONDS,
+    stale_ttl_seconds=settings.TRADE_STALE_TTL_SECONDS,
+    breaker=CircuitBreaker(
+        "main_backend",
+        window=settings.CIRCUIT_WINDOW,
+        min_calls=settings.CIRCUIT_MIN_CALLS,
+        failure_rate=settings.BACKEND_CIRCUIT_FAILURE_RATE,
+        slow_call_s=settings.BACKEND_CIRCUIT_SLOW_CALL_S,
+        open_seconds=settings.BACKEND_CIRCUIT_OPEN_S,
+    ),
+)
+
+
+def get_data_fetcher() -> DataFetcher:
+    return DATA_FETCHER
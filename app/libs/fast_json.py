@@ -0,0 +1,14 @@
+from typing import Any
+import json
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder produces the same JSON, just slower
+    orjson = None
+
+
+def dumps(obj: Any) -> str:
+    """Compact JSON text with non-ASCII characters kept as is."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,130 @@
+from functools import lru_cache
+from typing import List
+import re
+
+from google.genai import types as genai_types
+
+from ..schemas.llm_schemas import MessageRole
+from .config import settings
+from .llm_client import AsyncLLMClient
+from .prompts import history_summary_prompt
+from .session_store import SessionHistory, get_session_store
+
+# Word pieces and individual punctuation marks; ~1.3 model tokens per word piece.
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_TOKENS_PER_PIECE = 1.3
+
+
+# =====================================================================
+# 1. LOCAL TOKEN ESTIMATION
+# =====================================================================
+
+@lru_cache(maxsize=50_000)
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate. Cached, since history messages repeat every turn."""
+    if not text:
+        return 0
+    return int(len(_TOKEN_RE.findall(text)) * _TOKENS_PER_PIECE) + 1
+
+def estimate_content_tokens(contents: List[genai_types.Content]) -> int:
+    return sum(
+        estimate_tokens(part.text or "")
+        for content in contents
+        for part in content.parts or []
+    )
+
+
+# =====================================================================
+# 2. HISTORY COMPACTION
+# =====================================================================
+
+def _summary_content(summary: str) -> genai_types.Content:
+    return genai_types.Content(
+        role="user",
+        parts=[genai_types.Part.from_text(text=f"[Summary of the earlier conversation]\n{summary}")],
+    )
+
+def _choose_cut(history: SessionHistory, budget: int) -> int:
+    """
+    Index of the first message kept verbatim: the most recent messages that
+    fit in `budget` tokens (never fewer than HISTORY_MIN_RECENT_MESSAGES),
+    moved forward so the kept tail starts on a user turn.
+    """
+    messages = history.messages
+    start = history.summarized_upto
+    min_keep_from = max(start, len(messages) - settings.HISTORY_MIN_RECENT_MESSAGES)
+
+    used = 0
+    cut = len(messages)
+    while cut > start:
+        cost = estimate_tokens(messages[cut - 1].content)
+        if cut - 1 < min_keep_from and used + cost > budget:
+            break
+        used += cost
+        cut -= 1
+
+    while cut < min_keep_from and messages[cut].role != MessageRole.USER:
+        cut += 1
+    return cut
+
+async def _summarize(llm: AsyncLLMClient, previous: str, history: SessionHistory, end: int) -> str:
+    transcript = "\n".join(
+        f"{msg.role.upper()}: {msg.content}"
+        for msg in history.messages[history.summarized_upto:end]
+    )
+    response = await llm.generate_content(
+        contents=[
+            genai_types.Content(
+                role="user",
+                parts=[
+                    history_summary_prompt().part,
+                    genai_types.Part.from_text(
+                        text=f"EXISTING SUMMARY:\n{previous or '(none)'}\n\nNEW MESSAGES:\n{transcript}"
+                    ),
+                ],
+            )
+        ],
+        config=genai_types.GenerateContentConfig(
+            max_output_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS,
+        ),
+    )
+    return (response.text or "").strip()
+
+async def compact_history(
+    llm: AsyncLLMClient,
+    session_id: str,
+    history: SessionHistory,
+) -> List[genai_types.Content]:
+    """
+    Returns the history to send for this turn, bounded by HISTORY_TOKEN_BUDGET.
+
+    Recent turns are kept verbatim; older turns are folded into a rolling
+    summary stored on the session. Folding only happens when the verbatim
+    tail overflows the budget, and then trims it down to
+    HISTORY_COMPACT_TARGET_RATIO of the budget, so the summarization call runs
+    once every several turns rather than on every turn. If summarization
+    fails, the oldest turns are dropped for this request instead.
+    """
+    prefix = [_summary_content(history.summary)] if history.summary else []
+    tail = history.contents[history.summarized_upto:]
+
+    budget = settings.HISTORY_TOKEN_BUDGET
+    if budget <= 0 or estimate_content_tokens(prefix + tail) <= budget:
+        return prefix + tail
+
+    cut = _choose_cut(history, int(budget * settings.HISTORY_COMPACT_TARGET_RATIO))
+    if cut <= history.summarized_upto:
+        return prefix + tail
+
+    try:
+        summary = await _summarize(llm, history.summary or "", history, cut)
+    except Exception as e:
+        print(f"HISTORY WARNING: Summarization failed for session {session_id}, truncating instead. Error: {e}")
+        return prefix + history.contents[cut:]
+
+    if summary:
+        history.summary = summary
+        history.summarized_upto = cut
+        await get_session_store().save_summary(session_id, history)
+        prefix = [_summary_content(summary)]
+    return prefix + history.contents[cut:]
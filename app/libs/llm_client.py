@@ -0,0 +1,246 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, List, Optional
+import asyncio
+import inspect
+
+from google import genai
+from google.genai import types as genai_types
+
+from .config import settings
+from .metrics import record_usage
+from .resilience import CircuitBreaker, RetryBudget, call_with_retries, retry_reason
+
+
+# =====================================================================
+# ASYNC GEMINI CLIENT
+# =====================================================================
+
+class AsyncLLMClient:
+    """
+    Non-blocking wrapper around the google-genai client.
+
+    Calls go through the SDK's native asyncio surface (`client.aio`). If the
+    installed SDK does not expose it, the blocking calls are pushed onto a
+    bounded thread pool so an in-flight LLM request never freezes the
+    event loop.
+
+    Generation calls retry transient failures (429, 5xx, timeouts) with
+    full-jitter backoff, within a shared retry budget. Streams are only
+    retried until their first chunk arrives. Every attempt goes through the
+    circuit breaker, which raises CircuitOpenError while Gemini is unhealthy.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        max_workers: int = 16,
+        max_retries: int = 2,
+        backoff_base: float = 0.25,
+        backoff_max: float = 4.0,
+        retry_budget: Optional[RetryBudget] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        http_options = genai_types.HttpOptions(base_url=base_url, timeout=timeout_ms)
+        self._client = genai.Client(api_key=api_key, http_options=http_options)
+        self.model = model
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_budget = retry_budget or RetryBudget(ratio=0.1, max_tokens=10)
+        self.breaker = breaker or CircuitBreaker("gemini")
+
+        self._aio = getattr(self._client, "aio", None)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if self._aio is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="llm-client"
+            )
+
+    async def _run_blocking(self, func, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, **kwargs))
+
+    async def _with_retries(self, call):
+        return await call_with_retries(
+            call, self.retry_budget, self.max_retries, self.backoff_base, self.backoff_max
+        )
+
+    async def _guarded(self, call):
+        # Only transient errors say anything about Gemini's health; a 400 does not.
+        return await self.breaker.call(call, is_failure=lambda e: retry_reason(e) is not None)
+
+    async def _generate_once(self, kwargs: dict) -> genai_types.GenerateContentResponse:
+        if self._aio is not None:
+            return await self._guarded(lambda: self._aio.models.generate_content(**kwargs))
+        return await self._guarded(
+            lambda: self._run_blocking(self._client.models.generate_content, **kwargs)
+        )
+
+    async def _open_stream(self, kwargs: dict):
+        """Starts a stream and waits for its first chunk, so connection errors surface here."""
+        stream = self._aio.models.generate_content_stream(**kwargs)
+        if inspect.isawaitable(stream):
+            stream = await stream
+        iterator = stream.__aiter__()
+        try:
+            first = await iterator.__anext__()
+        except StopAsyncIteration:
+            first = None
+        return iterator, first
+
+    async def generate_content(
+        self,
+        contents: Any,
+        config: Optional[genai_types.GenerateContentConfig] = None,
+        model: Optional[str] = None,
+    ) -> genai_types.GenerateContentResponse:
+        """Runs a single (non-streaming) generation without blocking the loop."""
+        kwargs = dict(model=model or self.model, contents=contents, config=config)
+        response = await self._with_retries(lambda: self._generate_once(kwargs))
+        record_usage(kwargs["model"], response.usage_metadata)
+        return response
+
+    async def generate_content_stream(
+        self,
+        contents: Any,
+        config: Optional[genai_types.GenerateContentConfig] = None,
+        model: Optional[str] = None,
+    ) -> AsyncIterator[genai_types.GenerateContentResponse]:
+        """
+        Yields response chunks as the model produces them. Without the native
+        async surface the full response is generated off-loop and yielded once.
+        """
+        kwargs = dict(model=model or self.model, contents=contents, config=config)
+        if self._aio is None:
+            response = await self._with_retries(lambda: self._generate_once(kwargs))
+            record_usage(kwargs["model"], response.usage_metadata)
+            yield response
+            return
+
+        iterator, first = await self._with_retries(lambda: self._guarded(lambda: self._open_stream(kwargs)))
+        if first is None:
+            return
+        # Every chunk carries cumulative usage; only the last one is counted.
+        usage = first.usage_metadata
+        try:
+            yield first
+            async for chunk in iterator:
+                usage = chunk.usage_metadata or usage
+                yield chunk
+        finally:
+            record_usage(kwargs["model"], usage)
+
+    async def embed_content(
+        self,
+        texts: List[str],
+        model: Optional[str] = None,
+        task_type: str = "SEMANTIC_SIMILARITY",
+        output_dimensionality: Optional[int] = None,
+    ) -> List[List[float]]:
+        """
+        Embeds `texts` with the embedding model, one vector per text. Only
+        guarded by the circuit breaker, not retried: callers use embeddings
+        for optional lookups and should fall through on failure.
+        """
+        kwargs = dict(
+            model=model or settings.EMBEDDING_MODEL,
+            contents=texts,
+            config=genai_types.EmbedContentConfig(
+                task_type=task_type, output_dimensionality=output_dimensionality
+            ),
+        )
+        if self._aio is not None:
+            response = await self._guarded(lambda: self._aio.models.embed_content(**kwargs))
+        else:
+            response = await self._guarded(
+                lambda: self._run_blocking(self._client.models.embed_content, **kwargs)
+            )
+        return [embedding.values or [] for embedding in response.embeddings or []]
+
+    async def create_cached_content(
+        self,
+        config: genai_types.CreateCachedContentConfig,
+        model: Optional[str] = None,
+    ) -> genai_types.CachedContent:
+        """Creates a provider-side context cache (system instruction, tools, history prefix)."""
+        kwargs = dict(model=model or self.model, config=config)
+        if self._aio is not None:
+            return await self._aio.caches.create(**kwargs)
+        return await self._run_blocking(self._client.caches.create, **kwargs)
+
+    async def update_cached_content(self, name: str, ttl_seconds: int) -> genai_types.CachedContent:
+        """Extends the expiry of an existing context cache."""
+        kwargs = dict(name=name, config=genai_types.UpdateCachedContentConfig(ttl=f"{ttl_seconds}s"))
+        if self._aio is not None:
+            return await self._aio.caches.update(**kwargs)
+        return await self._run_blocking(self._client.caches.update, **kwargs)
+
+    async def delete_cached_content(self, name: str) -> None:
+        if self._aio is not None:
+            await self._aio.caches.delete(name=name)
+        else:
+            await self._run_blocking(self._client.caches.delete, name=name)
+
+    async def aclose(self) -> None:
+        """Releases the underlying HTTP sessions and executor threads."""
+        if self._aio is not None and hasattr(self._aio, "aclose"):
+            await self._aio.aclose()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+# --- Process-wide client ---
+# Created on first use (or at app startup) inside each worker process, never
+# at import time, so nothing is shared across forked/spawned workers.
+LLM_CLIENT: Optional[AsyncLLMClient] = None
+_LLM_INIT_FAILED = False
+
+
+def init_llm_client() -> Optional[AsyncLLMClient]:
+    global LLM_CLIENT, _LLM_INIT_FAILED
+    try:
+        LLM_CLIENT = AsyncLLMClient(
+            api_key=settings.GEMINI_API_KEY,
+            model=settings.GEMINI_MODEL,
+            base_url=settings.GEMINI_BASE_URL,
+            timeout_ms=settings.GEMINI_TIMEOUT_MS,
+            max_workers=settings.LLM_EXECUTOR_MAX_WORKERS,
+            max_retries=settings.LLM_MAX_RETRIES,
+            backoff_base=settings.LLM_BACKOFF_BASE_S,
+            backoff_max=settings.LLM_BACKOFF_MAX_S,
+            retry_budget=RetryBudget(
+                ratio=settings.LLM_RETRY_BUDGET_RATIO,
+                max_tokens=settings.LLM_RETRY_BUDGET_MAX_TOKENS,
+            ),
+            breaker=CircuitBreaker(
+                "gemini",
+                window=settings.CIRCUIT_WINDOW,
+                min_calls=settings.CIRCUIT_MIN_CALLS,
+                failure_rate=settings.LLM_CIRCUIT_FAILURE_RATE,
+                slow_call_s=settings.LLM_CIRCUIT_SLOW_CALL_S,
+                open_seconds=settings.LLM_CIRCUIT_OPEN_S,
+            ),
+        )
+    except Exception as e:
+        print(f"FATAL LLM ERROR: Failed to initialize Gemini Client. Check GEMINI_API_KEY. Error: {e}")
+        LLM_CLIENT = None
+        _LLM_INIT_FAILED = True
+    return LLM_CLIENT
+
+
+def get_llm_client() -> Optional[AsyncLLMClient]:
+    """Returns the process-wide async LLM client, or None if it failed to start."""
+    if LLM_CLIENT is None and not _LLM_INIT_FAILED:
+        return init_llm_client()
+    return LLM_CLIENT
+
+
+async def close_llm_client() -> None:
+    global LLM_CLIENT
+    if LLM_CLIENT is not None:
+        await LLM_CLIENT.aclose()
+        LLM_CLIENT = None
@@ -0,0 +1,286 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import time
+
+from .config import settings
+
+# Seconds; covers cache hits (~ms) up to long tool-calling turns.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 45.0, 90.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Start time (perf_counter) of the HTTP request being handled, set by MetricsMiddleware.
+REQUEST_START: ContextVar[Optional[float]] = ContextVar("request_start", default=None)
+# Endpoint label for stage spans, set by the handler via `begin_endpoint`.
+REQUEST_ENDPOINT: ContextVar[str] = ContextVar("request_endpoint", default="internal")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# =====================================================================
+# 1. METRIC TYPES
+# =====================================================================
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus sense. p50/p95/p99 are
+    estimated from the buckets (same interpolation as `histogram_quantile`)
+    and exported as a companion `<name>_quantile` gauge for dashboards that
+    do not run PromQL.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], _HistogramSeries] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = _HistogramSeries(len(self.buckets) + 1)
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.total += value
+        series.count += 1
+
+    def quantile(self, q: float, *labels: str) -> Optional[float]:
+        series = self._series.get(labels)
+        if series is None or series.count == 0:
+            return None
+        rank = q * series.count
+        cumulative = 0
+        for i, count in enumerate(series.counts):
+            if cumulative + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {series.count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series.total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series.count}")
+
+        quantile_name = f"{self.name}_quantile"
+        lines.append(f"# HELP {quantile_name} p50/p95/p99 of {self.name}, estimated from its buckets.")
+        lines.append(f"# TYPE {quantile_name} gauge")
+        for labels in sorted(self._series):
+            for q in QUANTILES:
+                label_str = _format_labels(self.labelnames, labels, f'quantile="{q}"')
+                lines.append(f"{quantile_name}{label_str} {_format_value(self.quantile(q, *labels))}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Per-process metric registry. Updates happen on the event loop thread,
+    so no locking is required. With several workers (serve.py) each process
+    reports its own series; aggregate them in Prometheus.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._metrics.setdefault(name, Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = METRICS.histogram(
+    "tradelm_http_request_duration_seconds",
+    "Time from receiving a request to sending the last response byte.",
+    ("method", "route", "status"),
+)
+STAGE_SECONDS = METRICS.histogram(
+    "tradelm_stage_duration_seconds",
+    "Time spent in each stage of a request.",
+    ("endpoint", "stage"),
+)
+GEMINI_TOKENS = METRICS.counter(
+    "tradelm_gemini_tokens_total",
+    "Tokens reported in Gemini usage metadata.",
+    ("model", "kind"),
+)
+GEMINI_CALLS = METRICS.counter(
+    "tradelm_gemini_calls_total",
+    "Gemini generation calls that returned usage metadata.",
+    ("model",),
+)
+
+
+# =====================================================================
+# 2. SPANS & USAGE
+# =====================================================================
+
+def begin_endpoint(endpoint: str) -> None:
+    """
+    Labels the following spans with `endpoint` and records the time between
+    the request arriving and the handler starting (body parsing, pydantic
+    validation, auth) as its `validation` stage.
+    """
+    REQUEST_ENDPOINT.set(endpoint)
+    start = REQUEST_START.get()
+    if settings.METRICS_ENABLED and start is not None:
+        STAGE_SECONDS.observe(time.perf_counter() - start, endpoint, "validation")
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Records the duration of the enclosed block as one stage of the current endpoint."""
+    if not settings.METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, REQUEST_ENDPOINT.get(), stage)
+
+
+_USAGE_FIELDS = (
+    ("prompt", "prompt_token_count"),
+    ("cached", "cached_content_token_count"),
+    ("candidates", "candidates_token_count"),
+    ("thoughts", "thoughts_token_count"),
+    ("tool_use_prompt", "tool_use_prompt_token_count"),
+)
+
+
+def record_usage(model: str, usage) -> None:
+    """Adds a response's `usage_metadata` token counts to the counters."""
+    if not settings.METRICS_ENABLED or usage is None:
+        return
+    GEMINI_CALLS.inc(model)
+    for kind, field in _USAGE_FIELDS:
+        count = getattr(usage, field, None)
+        if count:
+            GEMINI_TOKENS.inc(model, kind, amount=count)
+
+
+# =====================================================================
+# 3. ASGI MIDDLEWARE
+# =====================================================================
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request until its last body chunk is sent, so streaming
+    responses are measured end to end, and labels it with the route template
+    (e.g. `/chat/{session_id}`) to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        token = REQUEST_START.set(start)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_START.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, scope["method"], path, str(status_code)
+            )
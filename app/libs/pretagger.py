@@ -0,0 +1,170 @@
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import re
+
+from ..schemas.llm_schemas import TaggingResponse
+from .config import settings
+
+# Canonical tag -> phrases that name it. Phrases are matched on whole words
+# after case-folding, so "Broke out" and "broke  OUT" both hit "Breakout".
+TAG_VOCABULARY: Dict[str, List[str]] = {
+    "Breakout": ["breakout", "break out", "broke out", "breaking out", "range break", "orb"],
+    "Reversal": ["reversal", "reversed", "reversing", "double top", "double bottom"],
+    "Pullback": ["pullback", "pull back", "pulled back", "bought the dip", "buy the dip", "dip buy"],
+    "Trend Follow": ["trend follow", "trend following", "with the trend", "trend trade", "trend continuation"],
+    "Scalp": ["scalp", "scalped", "scalping", "quick scalp"],
+    "FOMO": ["fomo", "fear of missing out", "chased", "chasing", "chased the move", "chased entry"],
+    "Revenge Trade": ["revenge", "revenge trade", "revenge trading", "get it back"],
+    "Overtrading": ["overtrading", "overtraded", "too many trades"],
+    # Bare R-multiples ("2r") are as often losses as wins; only positive phrasings count.
+    "Good R:R": [
+        "good r:r", "good rr", "good risk reward", "great risk reward",
+        "2r winner", "3r winner", "4r winner", "made 2r", "made 3r", "made 4r",
+    ],
+    "Target Hit": [
+        "took profit at target", "hit target", "hit my target", "target hit", "tp hit",
+        "took profit", "took profits", "profit at target",
+    ],
+    "Stopped Out": ["stopped out", "hit stop", "hit my stop", "stop hit", "sl hit", "stop loss hit"],
+    "Poor Exit": [
+        "poor exit", "bad exit", "exited early", "exited too early", "cut too early",
+        "sold too early", "exited late", "exited too late", "held too long", "panic sold",
+    ],
+    "Moved Stop": ["moved stop", "moved my stop", "widened stop", "widened my stop"],
+    "Followed Plan": ["followed plan", "followed my plan", "followed the plan", "according to plan", "as planned"],
+    "Broke Rules": ["broke rules", "broke my rules", "no stop", "no plan", "against my rules"],
+    "Oversized": ["oversized", "over sized", "too big", "size too big", "sized too big", "overleveraged"],
+    "News": ["news", "earnings", "cpi", "fomc", "nfp"],
+    "Gap": ["gap up", "gap down", "gapped up", "gapped down", "gap fill", "gap and go"],
+}
+
+# Words that carry no tagging signal and do not count against coverage.
+STOPWORDS: Set[str] = {
+    "a", "an", "and", "as", "at", "but", "by", "for", "from", "i", "in", "into", "is", "it",
+    "its", "me", "my", "of", "on", "so", "the", "then", "this", "that", "to", "was", "we",
+    "were", "with", "trade", "entry", "entered", "exit", "again", "today",
+}
+
+# A match preceded by one of these (within a few words) may mean the opposite.
+NEGATIONS: Set[str] = {"no", "not", "never", "didn", "didnt", "don", "dont", "without", "avoid", "avoided", "wasn", "wasnt"}
+_NEGATION_WINDOW = 3
+
+# A loss anywhere in the note contradicts "Good R:R" ("lost 2r", "-3R").
+LOSS_WORDS: Set[str] = {"lost", "loss", "losses", "losing", "loser", "red"}
+_NEGATIVE_R_RE = re.compile(r"(?<![\w.])-\s*\d+(?:\.\d+)?\s*r\b", re.IGNORECASE)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?::[a-z0-9]+)?")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.casefold())
+
+
+# =====================================================================
+# 1. AHO-CORASICK OVER WORD TOKENS
+# =====================================================================
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton whose alphabet is words rather than characters:
+    one pass over a note's tokens finds every vocabulary phrase, in time
+    linear in the note length regardless of vocabulary size. Matching on
+    tokens gives whole-word boundaries for free.
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[Tuple[str, ...], str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per state: (phrase length in tokens, label) for every phrase ending here.
+        self._out: List[List[Tuple[int, str]]] = [[]]
+
+        for words, label in phrases:
+            state = 0
+            for word in words:
+                nxt = self._goto[state].get(word)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][word] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((len(words), label))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(word, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, tokens: List[str]) -> List[Tuple[int, int, str]]:
+        """Returns (start, end, label) for every phrase occurrence; `end` is exclusive."""
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        state = 0
+        for i, token in enumerate(tokens):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for length, label in out[state]:
+                matches.append((i + 1 - length, i + 1, label))
+        return matches
+
+
+def _build_matcher() -> PhraseMatcher:
+    return PhraseMatcher(
+        (tuple(tokenize(phrase)), tag)
+        for tag, phrases in TAG_VOCABULARY.items()
+        for phrase in phrases
+    )
+
+
+MATCHER = _build_matcher()
+
+
+# =====================================================================
+# 2. CONFIDENCE RULES
+# =====================================================================
+
+def pretag(notes: str) -> Optional[TaggingResponse]:
+    """
+    Tags formulaic notes locally. Returns None (use the LLM) unless the note
+    is short, every match is free of a nearby negation ("Good R:R" also of
+    any loss wording), and matched phrases explain at least
+    PRETAGGER_MIN_COVERAGE of its meaningful words.
+    """
+    tokens = tokenize(notes)
+    if not tokens or len(tokens) > settings.PRETAGGER_MAX_WORDS:
+        return None
+
+    matches = MATCHER.find(tokens)
+    if not matches:
+        return None
+
+    covered: Set[int] = set()
+    tags: List[str] = []
+    for start, end, tag in matches:
+        covered.update(range(start, end))
+        if tag not in tags:
+            tags.append(tag)
+
+    # Negations that are part of a phrase ("no plan") do not negate their neighbours.
+    for start, _, _ in matches:
+        window = range(max(0, start - _NEGATION_WINDOW), start)
+        if any(tokens[i] in NEGATIONS and i not in covered for i in window):
+            return None
+
+    if "Good R:R" in tags and (LOSS_WORDS.intersection(tokens) or _NEGATIVE_R_RE.search(notes)):
+        return None
+
+    content = [i for i, token in enumerate(tokens) if token not in STOPWORDS]
+    if content:
+        coverage = sum(1 for i in content if i in covered) / len(content)
+        if coverage < settings.PRETAGGER_MIN_COVERAGE:
+            return None
+    return TaggingResponse(tags=tags)
@@ -0,0 +1,139 @@
+from typing import Dict, Tuple
+
+from google.genai import types as genai_types
+
+from .config import settings
+
+
+class PromptTemplate:
+    """A versioned prompt. `template_id` ("name@version") keys caches and experiments."""
+
+    def __init__(self, name: str, version: str, text: str):
+        self.name = name
+        self.version = version
+        self.text = text
+
+    @property
+    def template_id(self) -> str:
+        return f"{self.name}@{self.version}"
+
+
+class CompiledPrompt:
+    """A rendered prompt with its Gemini `Content`/`Part` built once and reused."""
+
+    __slots__ = ("template_id", "text", "part", "content")
+
+    def __init__(self, template_id: str, text: str):
+        self.template_id = template_id
+        self.text = text
+        self.part = genai_types.Part.from_text(text=text)
+        self.content = genai_types.Content(role="user", parts=[self.part])
+
+
+# =====================================================================
+# 1. TEMPLATES
+# =====================================================================
+
+# Add a new version next to the old one and switch via Settings to A/B it.
+TEMPLATES: Dict[Tuple[str, str], PromptTemplate] = {
+    (t.name, t.version): t
+    for t in [
+        PromptTemplate(
+            "chat-system", "v1",
+            """
+    You are TradeLM, an expert AI Trading Analyst. Your persona is professional,
+    data-driven, and focused on helping the user improve their trading performance.
+    The user's current plan is: {plan}.
+    If the user asks an analytical question (e.g., 'What is my win rate?', 'Why did I lose money?'),
+    you MUST use the available tool: 'get_user_trade_summary' to gather data
+    before generating your final answer.
+    """,
+        ),
+        PromptTemplate(
+            "tagging", "v1",
+            """
+    Analyze the following trading journal notes and generate a list of
+    relevant tags. The tags should be short (e.g., 'FOMO', 'Breakout',
+    'Poor Exit', 'Reversal', 'Good R:R').
+    Only return the JSON object.
+    """,
+        ),
+        PromptTemplate(
+            "batch-tagging", "v1",
+            """
+    Analyze each of the following trading journal notes independently and
+    generate a list of relevant tags for each one. The tags should be short
+    (e.g., 'FOMO', 'Breakout', 'Poor Exit', 'Reversal', 'Good R:R').
+    Return a JSON array with exactly one object per note, echoing the
+    note's "index". Only return the JSON array.
+    """,
+        ),
+        PromptTemplate(
+            "history-summary", "v1",
+            """
+    You maintain a running summary of a conversation between a trader and
+    TradeLM, an AI trading analyst. Update the existing summary with the new
+    messages. Keep facts, numbers, symbols, the user's goals and any advice
+    already given; drop pleasantries. Write at most 200 words in plain prose.
+    Only return the updated summary.
+    """,
+        ),
+    ]
+}
+
+
+# =====================================================================
+# 2. COMPILED PROMPTS
+# =====================================================================
+
+_COMPILED: Dict[Tuple[str, str, str], CompiledPrompt] = {}
+
+
+def _compile(name: str, version: str, plan: str = "") -> CompiledPrompt:
+    key = (name, version, plan)
+    compiled = _COMPILED.get(key)
+    if compiled is None:
+        template = TEMPLATES[(name, version)]
+        template_id = f"{template.template_id}:{plan}" if plan else template.template_id
+        compiled = CompiledPrompt(template_id, template.text.format(plan=plan.upper()))
+        _COMPILED[key] = compiled
+    return compiled
+
+
+def plan_tier(user_plan: str) -> str:
+    """
+    The tier a plan is prompted and scheduled as. Plans outside PLAN_TIERS map
+    to OTHER_PLAN_TIER, so request input cannot grow the compiled set (or the
+    context and semantic cache keys derived from `template_id`).
+    """
+    plan = user_plan.lower()
+    return plan if plan in settings.PLAN_TIERS else settings.OTHER_PLAN_TIER
+
+
+def chat_system_prompt(user_plan: str) -> CompiledPrompt:
+    """System instruction for the user's plan tier."""
+    return _compile("chat-system", settings.CHAT_PROMPT_VERSION, plan_tier(user_plan))
+
+
+def tagging_prompt() -> CompiledPrompt:
+    return _compile("tagging", settings.TAGGING_PROMPT_VERSION)
+
+
+def batch_tagging_prompt() -> CompiledPrompt:
+    return _compile("batch-tagging", settings.BATCH_TAGGING_PROMPT_VERSION)
+
+
+def history_summary_prompt() -> CompiledPrompt:
+    return _compile("history-summary", settings.HISTORY_SUMMARY_PROMPT_VERSION)
+
+
+def compile_prompts() -> None:
+    """Precompiles the active templates for every known plan tier."""
+    for plan in [*settings.PLAN_TIERS, settings.OTHER_PLAN_TIER]:
+        chat_system_prompt(plan)
+    tagging_prompt()
+    batch_tagging_prompt()
+    history_summary_prompt()
+
+
+compile_prompts()
@@ -0,0 +1,324 @@
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+import asyncio
+import math
+import random
+import time
+
+import httpx
+from google.genai.errors import APIError
+
+from .metrics import METRICS
+
+T = TypeVar("T")
+
+# Status codes worth retrying: rate limiting and transient upstream failures.
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+GEMINI_RETRIES = METRICS.counter(
+    "tradelm_gemini_retries_total",
+    "Gemini calls retried after a transient failure.",
+    ("reason",),
+)
+GEMINI_RETRY_BUDGET_EXHAUSTED = METRICS.counter(
+    "tradelm_gemini_retry_budget_exhausted_total",
+    "Retries or hedges skipped because the retry budget was empty.",
+)
+CIRCUIT_STATE = METRICS.gauge(
+    "tradelm_circuit_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open).",
+    ("circuit",),
+)
+CIRCUIT_REJECTED = METRICS.counter(
+    "tradelm_circuit_rejected_total",
+    "Calls failed fast because a circuit was open.",
+    ("circuit",),
+)
+HEDGED_REQUESTS = METRICS.counter(
+    "tradelm_hedged_requests_total",
+    "Hedged requests by outcome (fired: a second attempt was started; won: it finished first).",
+    ("operation", "outcome"),
+)
+
+
+def retry_reason(error: BaseException) -> Optional[str]:
+    """Short label if `error` is transient and worth retrying, else None."""
+    if isinstance(error, APIError):
+        return str(error.code) if error.code in RETRYABLE_STATUS_CODES else None
+    if isinstance(error, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(error, httpx.TransportError):
+        return "transport"
+    return None
+
+
+# =====================================================================
+# 1. RETRY BUDGET & BACKOFF
+# =====================================================================
+
+class RetryBudget:
+    """
+    Caps retries (and hedges) at a fraction of regular traffic so a Gemini
+    outage cannot multiply our own load. Every first attempt deposits
+    `ratio` tokens, every extra attempt withdraws one; the balance never
+    exceeds `max_tokens`, which is also the burst allowance when idle.
+    """
+
+    def __init__(self, ratio: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._balance = max_tokens
+
+    def deposit(self) -> None:
+        self._balance = min(self.max_tokens, self._balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self._balance < 1.0:
+            GEMINI_RETRY_BUDGET_EXHAUSTED.inc()
+            return False
+        self._balance -= 1.0
+        return True
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff for the `attempt`-th retry (0-based)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+async def call_with_retries(
+    call: Callable[[], Awaitable[T]],
+    budget: RetryBudget,
+    max_retries: int,
+    backoff_base: float,
+    backoff_max: float,
+) -> T:
+    """
+    Runs `call`, retrying transient failures (429, 5xx, timeouts) with
+    full-jitter backoff while the retry budget allows. Anything else, or the
+    last failure, propagates unchanged.
+    """
+    budget.deposit()
+    attempt = 0
+    while True:
+        try:
+            return await call()
+        except Exception as e:
+            reason = retry_reason(e)
+            if reason is None or attempt >= max_retries or not budget.withdraw():
+                raise
+            GEMINI_RETRIES.inc(reason)
+            await asyncio.sleep(backoff_delay(attempt, backoff_base, backoff_max))
+            attempt += 1
+
+
+# =====================================================================
+# 2. HEDGED REQUESTS
+# =====================================================================
+
+class LatencyTracker:
+    """Rolling window of recent successful latencies, used to pick the hedge delay."""
+
+    def __init__(self, window: int, quantile: float, min_samples: int, default_s: float, floor_s: float):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.default_s = default_s
+        self.floor_s = floor_s
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def hedge_delay(self) -> float:
+        if len(self._samples) < self.min_samples:
+            return self.default_s
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(self.quantile * len(ordered)))
+        return max(self.floor_s, ordered[index])
+
+
+async def hedged(
+    call: Callable[[], Awaitable[T]],
+    tracker: LatencyTracker,
+    budget: RetryBudget,
+    operation: str,
+) -> T:
+    """
+    Starts `call`; if it has not finished after the tracker's p95 delay (and
+    the retry budget allows), starts a second identical call and returns
+    whichever succeeds first, cancelling the other. Since only the slowest
+    ~5% of calls are hedged, tail latency drops for a few percent extra cost.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    first = asyncio.ensure_future(call())
+    pending = {first}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=tracker.hedge_delay())
+        if done or not budget.withdraw():
+            result = await first
+            tracker.observe(loop.time() - started)
+            return result
+
+        HEDGED_REQUESTS.inc(operation, "fired")
+        second = asyncio.ensure_future(call())
+        pending.add(second)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        HEDGED_REQUESTS.inc(operation, "won")
+                    tracker.observe(loop.time() - started)
+                    return task.result()
+        # Both attempts failed: surface the original one's error.
+        return first.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+# =====================================================================
+# 3. CIRCUIT BREAKERS
+# =====================================================================
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Every breaker in this process, by name, for /health.
+CIRCUIT_BREAKERS: Dict[str, "CircuitBreaker"] = {}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} is unavailable (circuit open). Retry in {retry_after}s.")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a dependency is unhealthy instead of letting every
+    request wait for its full timeout.
+
+    Outcomes of the last `window` calls are kept; once at least `min_calls`
+    are recorded, the circuit opens if the failure rate or the rate of calls
+    slower than `slow_call_s` reaches its threshold. After `open_seconds`
+    up to `half_open_max_calls` probes are let through: one success closes
+    the circuit, one failure re-opens it. Cancelled calls (e.g. a hedge that
+    lost) are not counted either way.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 50,
+        min_calls: int = 20,
+        failure_rate: float = 0.5,
+        slow_call_s: float = 10.0,
+        slow_call_rate: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 2,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_s = slow_call_s
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        # (failed, slow) per call
+        self._outcomes: Deque[tuple] = deque(maxlen=window)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        CIRCUIT_BREAKERS[name] = self
+        CIRCUIT_STATE.set(0, name)
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            print(f"CIRCUIT {self.name}: {self.state} -> {state}")
+        self.state = state
+        CIRCUIT_STATE.set(_STATE_VALUES[state], self.name)
+
+    def _trip(self) -> None:
+        self._opened_at = time.monotonic()
+        self._probes = 0
+        self._set_state(OPEN)
+
+    def retry_after(self) -> int:
+        remaining = self._opened_at + self.open_seconds - time.monotonic()
+        return max(1, math.ceil(remaining))
+
+    def allow(self) -> None:
+        """Reserves a call, or raises CircuitOpenError. Pair with `record`/`cancel`."""
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                CIRCUIT_REJECTED.inc(self.name)
+                raise CircuitOpenError(self.name, self.retry_after())
+            self._probes = 0
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_max_calls:
+                CIRCUIT_REJECTED.inc(self.name)
+                raise CircuitOpenError(self.name, 1)
+            self._probes += 1
+
+    def record(self, failed: bool, duration_s: float) -> None:
+        slow = duration_s >= self.slow_call_s
+        if self.state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+            if failed or slow:
+                self._trip()
+            else:
+                self._outcomes.clear()
+                self._set_state(CLOSED)
+            return
+
+        self._outcomes.append((failed, slow))
+        if self.state != CLOSED or len(self._outcomes) < self.min_calls:
+            return
+        total = len(self._outcomes)
+        failures = sum(1 for f, _ in self._outcomes if f)
+        slow_calls = sum(1 for _, sl in self._outcomes if sl)
+        if failures / total >= self.failure_rate or slow_calls / total >= self.slow_call_rate:
+            self._outcomes.clear()
+            self._trip()
+
+    def cancel(self) -> None:
+        """Releases a reservation without recording an outcome."""
+        if self.state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        is_failure: Callable[[BaseException], bool] = lambda e: True,
+    ) -> T:
+        self.allow()
+        start = time.monotonic()
+        try:
+            result = await fn()
+        except Exception as e:
+            self.record(is_failure(e), time.monotonic() - start)
+            raise
+        except BaseException:
+            self.cancel()
+            raise
+        self.record(False, time.monotonic() - start)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot: Dict[str, Any] = {"state": self.state}
+        if self.state == OPEN:
+            snapshot["retry_after_s"] = self.retry_after()
+        if self._outcomes:
+            snapshot["recent_failure_rate"] = round(
+                sum(1 for f, _ in self._outcomes if f) / len(self._outcomes), 3
+            )
+        return snapshot
+
+
+def circuit_health() -> Dict[str, Dict[str, Any]]:
+    return {name: breaker.snapshot() for name, breaker in CIRCUIT_BREAKERS.items()}
@@ -0,0 +1,178 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import time
+
+import numpy as np
+
+from .admission import SEMANTIC_CACHE_ADMISSION, AdmissionRejected
+from .cache import TTLCache
+from .config import settings
+from .llm_client import AsyncLLMClient
+from .metrics import METRICS
+
+SEMANTIC_CACHE_LOOKUPS = METRICS.counter(
+    "tradelm_semantic_cache_lookups_total",
+    "Semantic chat cache lookups by outcome (hit, miss, stale, error, timeout, shed).",
+    ("outcome",),
+)
+
+
+class _CachedAnswer:
+    __slots__ = ("plan_key", "data_version", "expires_at", "answer")
+
+    def __init__(self, plan_key: str, data_version: int, expires_at: float, answer: str):
+        self.plan_key = plan_key
+        self.data_version = data_version
+        self.expires_at = expires_at
+        self.answer = answer
+
+
+class _UserIndex:
+    """One user's cached answers and their unit-length question embeddings, row-aligned."""
+
+    __slots__ = ("vectors", "answers")
+
+    def __init__(self, dimensions: int):
+        self.vectors = np.empty((0, dimensions), dtype=np.float32)
+        self.answers: List[_CachedAnswer] = []
+
+    def add(self, vector: np.ndarray, answer: _CachedAnswer, max_entries: int) -> None:
+        # Answers for an older data version can never be served again.
+        keep = [i for i, a in enumerate(self.answers) if a.data_version == answer.data_version]
+        keep = keep[-(max_entries - 1):] if max_entries > 1 else []
+        self.vectors = np.vstack([self.vectors[keep], vector[None, :]])
+        self.answers = [self.answers[i] for i in keep] + [answer]
+
+
+class SemanticLookup:
+    """Result of a lookup; pass it back to `SemanticCache.store` to cache the fresh answer."""
+
+    __slots__ = ("user_id", "plan_key", "data_version", "vector", "answer")
+
+    def __init__(self, user_id: str, plan_key: str, data_version: int, vector: np.ndarray):
+        self.user_id = user_id
+        self.plan_key = plan_key
+        self.data_version = data_version
+        self.vector = vector
+        self.answer: Optional[str] = None
+
+
+class SemanticCache:
+    """
+    Per-user cache of chat answers keyed by the meaning of the question.
+
+    The new message, prefixed with the previous user turn when there is one
+    (so a follow-up like "why?" only matches the same follow-up to the same
+    question), is embedded and compared (cosine, i.e. a dot product of
+    unit vectors) against that user's cached questions; among the top-k most
+    similar, the first one above SEMANTIC_CACHE_MIN_SIMILARITY whose answer
+    was produced for the same plan prompt and the user's current trade data
+    version is returned. Only answers grounded in tool calls are stored, so
+    small talk is never replayed. Embedding failures, embeddings slower than
+    SEMANTIC_CACHE_EMBED_TIMEOUT_S and lookups shed by SEMANTIC_CACHE_ADMISSION
+    are treated as misses.
+    """
+
+    def __init__(self):
+        self._users: TTLCache[_UserIndex] = TTLCache(
+            max_entries=settings.SEMANTIC_CACHE_MAX_USERS,
+            ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+            name="semantic_cache",
+        )
+
+    def cacheable(self, message: str) -> bool:
+        return settings.SEMANTIC_CACHE_ENABLED and 0 < len(message.strip()) <= settings.SEMANTIC_CACHE_MAX_MESSAGE_CHARS
+
+    async def _embed(self, llm: AsyncLLMClient, text: str) -> Optional[np.ndarray]:
+        try:
+            values = (await llm.embed_content(
+                [text.strip()], output_dimensionality=settings.EMBEDDING_DIMENSIONS
+            ))[0]
+        except Exception as e:
+            print(f"SEMANTIC CACHE WARNING: embedding failed, skipping cache: {e}")
+            return None
+        vector = np.asarray(values, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    async def lookup(
+        self,
+        llm: AsyncLLMClient,
+        user_id: str,
+        plan_key: str,
+        message: str,
+        data_version: int,
+        previous_message: Optional[str] = None,
+    ) -> Optional[SemanticLookup]:
+        """None if the message is not cacheable or could not be embedded; else a lookup whose `answer` is set on a hit."""
+        if not self.cacheable(message):
+            return None
+        text = message.strip()
+        if previous_message and previous_message.strip():
+            context = previous_message.strip()[-settings.SEMANTIC_CACHE_MAX_MESSAGE_CHARS:]
+            text = f"{context}\n{text}"
+        try:
+            async with SEMANTIC_CACHE_ADMISSION.admit():
+                vector = await asyncio.wait_for(self._embed(llm, text), settings.SEMANTIC_CACHE_EMBED_TIMEOUT_S)
+        except AdmissionRejected:
+            SEMANTIC_CACHE_LOOKUPS.inc("shed")
+            return None
+        except asyncio.TimeoutError:
+            SEMANTIC_CACHE_LOOKUPS.inc("timeout")
+            return None
+        if vector is None:
+            SEMANTIC_CACHE_LOOKUPS.inc("error")
+            return None
+        lookup = SemanticLookup(user_id, plan_key, data_version, vector)
+
+        index = self._users.get(user_id)
+        if index is None or not index.answers or index.vectors.shape[1] != vector.shape[0]:
+            SEMANTIC_CACHE_LOOKUPS.inc("miss")
+            return lookup
+
+        similarities = index.vectors @ vector
+        k = min(settings.SEMANTIC_CACHE_TOP_K, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        outcome = "miss"
+        now = time.monotonic()
+        for i in top[np.argsort(-similarities[top])]:
+            if similarities[i] < settings.SEMANTIC_CACHE_MIN_SIMILARITY:
+                break
+            cached = index.answers[i]
+            if cached.plan_key != plan_key or cached.expires_at < now:
+                continue
+            if cached.data_version != data_version:
+                outcome = "stale"
+                continue
+            lookup.answer = cached.answer
+            outcome = "hit"
+            break
+        SEMANTIC_CACHE_LOOKUPS.inc(outcome)
+        return lookup
+
+    def store(self, lookup: SemanticLookup, answer: str) -> None:
+        if not answer:
+            return
+        index = self._users.get(lookup.user_id)
+        if index is None or index.vectors.shape[1] != lookup.vector.shape[0]:
+            index = _UserIndex(lookup.vector.shape[0])
+        index.add(
+            lookup.vector,
+            _CachedAnswer(
+                lookup.plan_key,
+                lookup.data_version,
+                time.monotonic() + settings.SEMANTIC_CACHE_TTL_SECONDS,
+                answer,
+            ),
+            settings.SEMANTIC_CACHE_MAX_ENTRIES_PER_USER,
+        )
+        self._users.set(lookup.user_id, index)
+
+    def drop_user(self, user_id: str) -> None:
+        self._users.pop(user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._users.stats()
+
+
+SEMANTIC_CACHE = SemanticCache()
@@ -0,0 +1,328 @@
+from typing import Iterable, List, Optional, Tuple
+import asyncio
+import sqlite3
+import threading
+import time
+
+from google.genai import types as genai_types
+
+from ..schemas.llm_schemas import ChatMessage, MessageRole
+from .cache import TTLCache
+from .config import settings
+
+
+def message_to_content(msg: ChatMessage) -> genai_types.Content:
+    """Converts a single chat message into a Gemini `Content` object."""
+    return genai_types.Content(
+        role="user" if msg.role in [MessageRole.USER, MessageRole.TOOL] else "model",
+        parts=[genai_types.Part.from_text(text=msg.content)]
+    )
+
+
+class SessionHistory:
+    """
+    Conversation history for one session, kept alongside its pre-converted
+    Gemini form so each turn only converts the messages it adds.
+
+    `summary` is the rolling summary of `messages[:summarized_upto]`, which are
+    no longer sent verbatim (see app/libs/history.py). `revision` is the
+    persistent store's write counter this copy reflects (0 for memory only).
+    """
+
+    __slots__ = ("messages", "contents", "summary", "summarized_upto", "revision")
+
+    def __init__(self, messages: Iterable[ChatMessage] = ()):
+        self.messages: List[ChatMessage] = []
+        self.contents: List[genai_types.Content] = []
+        self.summary: Optional[str] = None
+        self.summarized_upto = 0
+        self.revision = 0
+        self.extend(messages)
+
+    def extend(self, messages: Iterable[ChatMessage]) -> None:
+        for msg in messages:
+            self.messages.append(msg)
+            self.contents.append(message_to_content(msg))
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+
+# =====================================================================
+# STORE BACKENDS
+# =====================================================================
+
+class SessionStore:
+    """Interface for server-side chat history keyed by session_id."""
+
+    async def get(self, session_id: str) -> Optional[SessionHistory]:
+        raise NotImplementedError
+
+    async def save(self, session_id: str, history: SessionHistory) -> None:
+        """Replaces the stored history (used when the backend resends it in full)."""
+        raise NotImplementedError
+
+    async def append(self, session_id: str, messages: List[ChatMessage]) -> None:
+        raise NotImplementedError
+
+    async def save_summary(self, session_id: str, history: SessionHistory) -> None:
+        """Persists `history.summary` and `history.summarized_upto`."""
+        raise NotImplementedError
+
+    async def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+
+class InMemorySessionStore(SessionStore):
+    """Per-process store with LRU eviction and an idle TTL."""
+
+    def __init__(self, max_sessions: int, ttl_seconds: float):
+        self._sessions: TTLCache[SessionHistory] = TTLCache(
+            max_entries=max_sessions, ttl_seconds=ttl_seconds, name="session_store"
+        )
+
+    async def get(self, session_id: str) -> Optional[SessionHistory]:
+        return self._sessions.get(session_id)
+
+    async def save(self, session_id: str, history: SessionHistory) -> None:
+        self._sessions.set(session_id, history)
+
+    async def append(self, session_id: str, messages: List[ChatMessage]) -> None:
+        history = self._sessions.get(session_id)
+        if history is None:
+            history = SessionHistory()
+        history.extend(messages)
+        # Re-setting refreshes both the LRU position and the idle TTL.
+        self._sessions.set(session_id, history)
+
+    async def save_summary(self, session_id: str, history: SessionHistory) -> None:
+        # The history object itself is the stored value.
+        self._sessions.set(session_id, history)
+
+    async def delete(self, session_id: str) -> None:
+        self._sessions.pop(session_id)
+
+    def stats(self):
+        return self._sessions.stats()
+
+
+class SQLiteSessionStore(InMemorySessionStore):
+    """
+    Persists messages to a local SQLite file so sessions survive restarts and
+    are shared by every worker process on the host.
+
+    SQLite is the source of truth. Every write bumps the session's row in
+    `session_revisions` in the same transaction, and the in-memory LRU tier
+    in front of it keeps converted histories tagged with the revision they
+    reflect: a read costs one indexed lookup, and the history is only
+    reloaded when another worker has written to the session since.
+    """
+
+    def __init__(self, path: str, max_sessions: int, ttl_seconds: float):
+        super().__init__(max_sessions=max_sessions, ttl_seconds=ttl_seconds)
+        # Transactions are managed explicitly (BEGIN IMMEDIATE for writes).
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS session_messages (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS session_summaries (
+                    session_id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    summarized_upto INTEGER NOT NULL
+                )
+                """
+            )
+            # Kept on delete so revisions never repeat for a session_id.
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS session_revisions (
+                    session_id TEXT PRIMARY KEY,
+                    revision INTEGER NOT NULL
+                )
+                """
+            )
+
+    def _transaction(self, mode: str, body):
+        with self._lock:
+            self._conn.execute(f"BEGIN {mode}")
+            try:
+                result = body()
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return result
+
+    def _revision(self, session_id: str) -> int:
+        row = self._conn.execute(
+            "SELECT revision FROM session_revisions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _bump(self, session_id: str) -> int:
+        return self._conn.execute(
+            """
+            INSERT INTO session_revisions (session_id, revision) VALUES (?, 1)
+            ON CONFLICT (session_id) DO UPDATE SET revision = revision + 1
+            RETURNING revision
+            """,
+            (session_id,),
+        ).fetchall()[0][0]
+
+    def _load(self, session_id: str, cached_revision: Optional[int]) -> Tuple[int, Optional[SessionHistory]]:
+        """(revision, history); history is None when unchanged from `cached_revision` or missing."""
+
+        def body():
+            revision = self._revision(session_id)
+            if revision == cached_revision:
+                return revision, None
+            rows = self._conn.execute(
+                "SELECT role, content FROM session_messages WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+            summary_row = self._conn.execute(
+                "SELECT summary, summarized_upto FROM session_summaries WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            if not rows:
+                return revision, None
+            history = SessionHistory(ChatMessage(role=role, content=content) for role, content in rows)
+            if summary_row:
+                history.summary, history.summarized_upto = summary_row
+            history.revision = revision
+            return revision, history
+
+        return self._transaction("DEFERRED", body)
+
+    def _write(self, session_id: str, messages: List[ChatMessage], replace: bool) -> int:
+        now = time.time()
+
+        def body():
+            if replace:
+                self._conn.execute("DELETE FROM session_messages WHERE session_id = ?", (session_id,))
+                self._conn.execute("DELETE FROM session_summaries WHERE session_id = ?", (session_id,))
+                start = 0
+            else:
+                start = self._conn.execute(
+                    "SELECT COALESCE(MAX(seq) + 1, 0) FROM session_messages WHERE session_id = ?",
+                    (session_id,),
+                ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT INTO session_messages (session_id, seq, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(session_id, start + i, m.role, m.content, now) for i, m in enumerate(messages)],
+            )
+            return self._bump(session_id)
+
+        return self._transaction("IMMEDIATE", body)
+
+    def _write_summary(self, session_id: str, summary: str, summarized_upto: int) -> int:
+        def body():
+            self._conn.execute(
+                "INSERT OR REPLACE INTO session_summaries (session_id, summary, summarized_upto) VALUES (?, ?, ?)",
+                (session_id, summary, summarized_upto),
+            )
+            return self._bump(session_id)
+
+        return self._transaction("IMMEDIATE", body)
+
+    def _remove(self, session_id: str) -> None:
+        def body():
+            self._conn.execute("DELETE FROM session_messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM session_summaries WHERE session_id = ?", (session_id,))
+            self._bump(session_id)
+
+        self._transaction("IMMEDIATE", body)
+
+    async def _after_write(self, session_id: str, history: Optional[SessionHistory], revision: int) -> None:
+        # The memory copy stays valid only if no other worker wrote in between.
+        if history is not None and history.revision == revision - 1:
+            history.revision = revision
+            await super().save(session_id, history)
+        else:
+            await super().delete(session_id)
+
+    async def get(self, session_id: str) -> Optional[SessionHistory]:
+        cached = await super().get(session_id)
+        revision, history = await asyncio.to_thread(
+            self._load, session_id, cached.revision if cached is not None else None
+        )
+        if cached is not None and cached.revision == revision:
+            return cached
+        if history is None:
+            await super().delete(session_id)
+            return None
+        await super().save(session_id, history)
+        return history
+
+    async def save(self, session_id: str, history: SessionHistory) -> None:
+        history.revision = await asyncio.to_thread(self._write, session_id, list(history.messages), True)
+        await super().save(session_id, history)
+
+    async def append(self, session_id: str, messages: List[ChatMessage]) -> None:
+        # Refresh the memory tier first so the append extends the current history.
+        history = await self.get(session_id) or SessionHistory()
+        revision = await asyncio.to_thread(self._write, session_id, list(messages), False)
+        history.extend(messages)
+        await self._after_write(session_id, history, revision)
+
+    async def save_summary(self, session_id: str, history: SessionHistory) -> None:
+        revision = await asyncio.to_thread(
+            self._write_summary, session_id, history.summary or "", history.summarized_upto
+        )
+        await self._after_write(session_id, history, revision)
+
+    async def delete(self, session_id: str) -> None:
+        await asyncio.to_thread(self._remove, session_id)
+        await super().delete(session_id)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def build_session_store() -> SessionStore:
+    """Creates the store selected by SESSION_STORE_BACKEND ('memory' or 'sqlite')."""
+    if settings.SESSION_STORE_BACKEND == "sqlite":
+        return SQLiteSessionStore(
+            path=settings.SESSION_SQLITE_PATH,
+            max_sessions=settings.SESSION_STORE_MAX_SESSIONS,
+            ttl_seconds=settings.SESSION_STORE_TTL_SECONDS,
+        )
+    if settings.SESSION_STORE_BACKEND != "memory":
+        print(f"WARNING: Unknown SESSION_STORE_BACKEND '{settings.SESSION_STORE_BACKEND}', using 'memory'.")
+    return InMemorySessionStore(
+        max_sessions=settings.SESSION_STORE_MAX_SESSIONS,
+        ttl_seconds=settings.SESSION_STORE_TTL_SECONDS,
+    )
+
+
+_SESSION_STORE: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    """Process-wide store, built on first use so no connection is opened at import."""
+    global _SESSION_STORE
+    if _SESSION_STORE is None:
+        _SESSION_STORE = build_session_store()
+    return _SESSION_STORE
+
+
+def close_session_store() -> None:
+    global _SESSION_STORE
+    if isinstance(_SESSION_STORE, SQLiteSessionStore):
+        _SESSION_STORE.close()
+    _SESSION_STORE = None
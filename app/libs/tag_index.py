@@ -0,0 +1,180 @@
+from collections import Counter as Multiset
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import re
+import unicodedata
+
+from google.genai import types as genai_types
+
+from ..schemas.llm_schemas import TaggingResponse
+from .config import settings
+from .metrics import METRICS
+from .pretagger import TAG_VOCABULARY
+
+# Extra spellings the model tends to produce for a canonical tag, on top of
+# the note phrases in TAG_VOCABULARY (which are also accepted as tags).
+TAG_SYNONYMS: Dict[str, List[str]] = {
+    "Breakout": ["breakout trade", "range breakout"],
+    "Reversal": ["reversal trade", "mean reversion", "counter trend"],
+    "Pullback": ["dip buying", "buying the dip", "retracement"],
+    "Trend Follow": ["trend", "trend trading", "momentum"],
+    "Scalp": ["scalp trade", "scalping trade"],
+    "FOMO": ["chasing", "chase", "chased price"],
+    "Revenge Trade": ["revenge trades", "tilt", "on tilt"],
+    "Overtrading": ["overtrade", "over trading"],
+    "Good R:R": ["good risk to reward", "good risk/reward", "favorable risk reward", "good rr ratio"],
+    "Target Hit": ["profit target hit", "take profit hit", "target reached", "hit profit target"],
+    "Stopped Out": ["stop out", "stop loss", "stop loss triggered"],
+    "Poor Exit": ["early exit", "late exit", "premature exit", "bad timing on exit"],
+    "Moved Stop": ["moved stop loss", "widened stop loss", "stop moved"],
+    "Followed Plan": ["plan followed", "disciplined", "discipline", "stuck to plan"],
+    "Broke Rules": ["rule break", "rules broken", "broke trading rules", "no stop loss", "undisciplined"],
+    "Oversized": ["oversized position", "position too large", "over leveraged", "overleverage"],
+    "News": ["news trade", "news event", "earnings play", "macro news"],
+    "Gap": ["gap trade", "gap play", "gapper"],
+}
+
+TAG_CANONICALIZATION = METRICS.counter(
+    "tradelm_tag_canonicalization_total",
+    "Tags returned by the model, by how they were mapped onto the vocabulary (exact, fuzzy, unmatched).",
+    ("match",),
+)
+
+_SEPARATORS_RE = re.compile(r"[\s\-_/&+.,;'\"()]+")
+
+
+def normalize_tag(tag: str) -> str:
+    """Unicode-normalized, case-folded, punctuation collapsed: 'Risk/Reward ' -> 'risk reward'."""
+    tag = unicodedata.normalize("NFKC", tag).casefold()
+    return _SEPARATORS_RE.sub(" ", tag).strip()
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# =====================================================================
+# 1. CANONICAL INDEX
+# =====================================================================
+
+class TagIndex:
+    """
+    Maps free-text tags onto the canonical vocabulary.
+
+    Normalized canonical names and synonyms are looked up exactly first.
+    Otherwise candidates are gathered from a precomputed trigram -> key
+    index (only keys sharing a trigram are scored) and the best one wins if
+    its Dice similarity reaches `min_similarity`, which absorbs plurals and
+    typos ("Breakouts", "Revenge trading", "Overtraded").
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str]], min_similarity: float):
+        self.min_similarity = min_similarity
+        self.canonical: List[str] = []
+        self._exact: Dict[str, str] = {}
+        for alias, canonical in entries:
+            if canonical not in self.canonical:
+                self.canonical.append(canonical)
+            self._exact.setdefault(normalize_tag(alias), canonical)
+
+        self._keys: List[str] = list(self._exact)
+        self._key_trigrams: List[Set[str]] = [_trigrams(key) for key in self._keys]
+        self._postings: Dict[str, List[int]] = {}
+        for key_id, grams in enumerate(self._key_trigrams):
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(key_id)
+
+    def lookup(self, tag: str) -> Tuple[Optional[str], str]:
+        """(canonical tag or None, "exact" | "fuzzy" | "unmatched")."""
+        normalized = normalize_tag(tag)
+        canonical = self._exact.get(normalized)
+        if canonical is not None:
+            return canonical, "exact"
+        if not normalized:
+            return None, "unmatched"
+
+        grams = _trigrams(normalized)
+        shared = Multiset(key_id for gram in grams for key_id in self._postings.get(gram, ()))
+        best_id, best_score = None, 0.0
+        for key_id, overlap in shared.items():
+            score = 2 * overlap / (len(grams) + len(self._key_trigrams[key_id]))
+            if score > best_score:
+                best_id, best_score = key_id, score
+        if best_id is not None and best_score >= self.min_similarity:
+            return self._exact[self._keys[best_id]], "fuzzy"
+        return None, "unmatched"
+
+
+def _build_index() -> TagIndex:
+    entries = []
+    for source in (TAG_VOCABULARY, TAG_SYNONYMS):
+        for canonical, aliases in source.items():
+            entries.append((canonical, canonical))
+            entries.extend((alias, canonical) for alias in aliases)
+    return TagIndex(entries, settings.TAG_FUZZY_MIN_SIMILARITY)
+
+
+TAG_INDEX = _build_index()
+CANONICAL_TAGS: List[str] = TAG_INDEX.canonical
+
+
+@lru_cache(maxsize=4096)
+def _lookup(tag: str) -> Tuple[Optional[str], str]:
+    # The model repeats the same few dozen spellings; memoize them.
+    return TAG_INDEX.lookup(tag)
+
+
+# =====================================================================
+# 2. APPLYING IT TO RESULTS
+# =====================================================================
+
+def canonicalize_tags(tags: Iterable[str]) -> List[str]:
+    """
+    Canonical, de-duplicated tags in first-seen order. Tags that match
+    nothing are dropped unless TAG_KEEP_UNMATCHED is set, in which case they
+    are kept in title case so they still aggregate consistently.
+    """
+    result: List[str] = []
+    for tag in tags:
+        canonical, match = _lookup(tag)
+        TAG_CANONICALIZATION.inc(match)
+        if canonical is None and settings.TAG_KEEP_UNMATCHED:
+            canonical = normalize_tag(tag).title() or None
+        if canonical is not None and canonical not in result:
+            result.append(canonical)
+    return result
+
+
+def canonicalize_response(response: TaggingResponse) -> TaggingResponse:
+    return TaggingResponse(tags=canonicalize_tags(response.tags))
+
+
+def _tags_schema() -> genai_types.Schema:
+    if not settings.TAG_ENUM_CONSTRAINT:
+        return genai_types.Schema(type=genai_types.Type.ARRAY, items=genai_types.Schema(type=genai_types.Type.STRING))
+    return genai_types.Schema(
+        type=genai_types.Type.ARRAY,
+        items=genai_types.Schema(type=genai_types.Type.STRING, enum=list(CANONICAL_TAGS)),
+    )
+
+
+def tagging_response_schema() -> genai_types.Schema:
+    """`response_schema` for single-note tagging; tags are limited to CANONICAL_TAGS."""
+    return genai_types.Schema(
+        type=genai_types.Type.OBJECT,
+        properties={"tags": _tags_schema()},
+        required=["tags"],
+    )
+
+
+def batch_tagging_response_schema() -> genai_types.Schema:
+    """`response_schema` for batch tagging: an array of {index, tags}."""
+    return genai_types.Schema(
+        type=genai_types.Type.ARRAY,
+        items=genai_types.Schema(
+            type=genai_types.Type.OBJECT,
+            properties={"index": genai_types.Schema(type=genai_types.Type.INTEGER), "tags": _tags_schema()},
+            required=["index", "tags"],
+        ),
+    )
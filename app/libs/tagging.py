@@ -0,0 +1,227 @@
+from typing import Dict, List, Optional, Union
+import asyncio
+import hashlib
+import re
+import unicodedata
+
+from google.genai import types as genai_types
+from pydantic import TypeAdapter
+
+from ..schemas.llm_schemas import (
+    TaggingResponse, IndexedTaggingResponse, BatchTaggingResult
+)
+from .admission import TAG_ADMISSION, TAG_BATCH_ADMISSION, AdmissionRejected
+from .cache import TTLCache
+from .config import settings
+from .fast_json import dumps
+from .llm_client import AsyncLLMClient
+from .metrics import METRICS
+from .pretagger import pretag
+from .prompts import batch_tagging_prompt, tagging_prompt
+from .resilience import LatencyTracker, hedged
+from .tag_index import batch_tagging_response_schema, canonicalize_response, canonicalize_tags, tagging_response_schema
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+TAG_CACHE: TTLCache[TaggingResponse] = TTLCache(
+    max_entries=settings.TAG_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.TAG_CACHE_TTL_SECONDS,
+    name="tag_cache",
+)
+
+TAG_RESULTS = METRICS.counter(
+    "tradelm_tag_results_total",
+    "Tagging results by where they came from (local pre-tagger, cache, llm).",
+    ("source",),
+)
+
+# Parses the batch output in one pass of pydantic's Rust JSON parser.
+_BATCH_OUTPUT = TypeAdapter(List[IndexedTaggingResponse])
+
+TAG_LATENCY = LatencyTracker(
+    window=500,
+    quantile=settings.TAG_HEDGE_QUANTILE,
+    min_samples=50,
+    default_s=settings.TAG_HEDGE_DEFAULT_DELAY_S,
+    floor_s=settings.TAG_HEDGE_MIN_DELAY_S,
+)
+
+
+# =====================================================================
+# CACHE KEYS
+# =====================================================================
+
+def normalize_notes(notes: str) -> str:
+    """Canonical form of a note: Unicode-normalized, case-folded, single-spaced."""
+    notes = unicodedata.normalize("NFKC", notes).casefold()
+    return _WHITESPACE_RE.sub(" ", notes).strip()
+
+
+def tagging_cache_key(notes: str, model: Optional[str] = None) -> str:
+    """Content-addressed key: hash of normalized notes, model and prompt template ID."""
+    material = "\x00".join(
+        [model or settings.GEMINI_MODEL, tagging_prompt().template_id, normalize_notes(notes)]
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+# =====================================================================
+# TAGGING
+# =====================================================================
+
+async def generate_tags(llm: AsyncLLMClient, notes: str) -> TaggingResponse:
+    """
+    Returns tags for a note. Formulaic notes are tagged by the local
+    pre-tagger and repeated/near-identical notes are served from the cache;
+    only the rest reach the LLM and take a TAG_ADMISSION slot (AdmissionRejected when
+    saturated). Slow calls are hedged with a second request when
+    TAG_HEDGE_ENABLED. LLM tags are mapped onto the canonical vocabulary
+    before caching. LLM errors propagate to the caller and are never cached.
+    """
+    if settings.PRETAGGER_ENABLED:
+        local = pretag(notes)
+        if local is not None:
+            TAG_RESULTS.inc("local")
+            return local
+
+    key = tagging_cache_key(notes, llm.model) if settings.TAG_CACHE_ENABLED else None
+    if key is not None:
+        cached = TAG_CACHE.get(key)
+        if cached is not None:
+            TAG_RESULTS.inc("cache")
+            return cached
+
+    def call():
+        return llm.generate_content(
+            contents=[
+                genai_types.Content(
+                    role="user",
+                    parts=[tagging_prompt().part, genai_types.Part.from_text(text=f"NOTES: {notes}")],
+                )
+            ],
+            config=genai_types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=tagging_response_schema(),
+            ),
+        )
+
+    async with TAG_ADMISSION.admit():
+        if settings.TAG_HEDGE_ENABLED:
+            response = await hedged(call, TAG_LATENCY, llm.retry_budget, "tag_trade")
+        else:
+            response = await call()
+    result = canonicalize_response(TaggingResponse.model_validate_json(response.text))
+    TAG_RESULTS.inc("llm")
+
+    if key is not None:
+        TAG_CACHE.set(key, result)
+    return result
+
+
+# =====================================================================
+# BATCH TAGGING
+# =====================================================================
+
+async def _tag_chunk(
+    llm: AsyncLLMClient,
+    chunk: Dict[int, str],
+) -> Dict[int, Union[TaggingResponse, str]]:
+    """Tags a chunk of notes with one structured-output call. Values are results or error strings."""
+    notes_json = dumps([{"index": index, "notes": notes} for index, notes in chunk.items()])
+    try:
+        response = await llm.generate_content(
+            contents=[
+                genai_types.Content(
+                    role="user",
+                    parts=[
+                        batch_tagging_prompt().part,
+                        genai_types.Part.from_text(text=f"NOTES (JSON): {notes_json}"),
+                    ],
+                )
+            ],
+            config=genai_types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=batch_tagging_response_schema(),
+            ),
+        )
+        entries = _BATCH_OUTPUT.validate_json(response.text)
+    except Exception as e:
+        return {index: f"Tagging failed for this chunk: {e}" for index in chunk}
+
+    results: Dict[int, Union[TaggingResponse, str]] = {
+        entry.index: TaggingResponse(tags=canonicalize_tags(entry.tags)) for entry in entries if entry.index in chunk
+    }
+    for index in chunk:
+        results.setdefault(index, "The model returned no tags for this note.")
+    return results
+
+
+async def generate_tags_batch(llm: AsyncLLMClient, notes_list: List[str]) -> List[BatchTaggingResult]:
+    """
+    Tags many notes at once. Notes the local pre-tagger is confident about
+    and cache hits are served directly, duplicate notes
+    are tagged once, and the remaining notes are packed into chunks of
+    TAG_BATCH_CHUNK_SIZE that run concurrently (at most
+    TAG_BATCH_MAX_CONCURRENCY in flight), each holding a TAG_BATCH_ADMISSION
+    slot. A failing or rejected chunk only fails its own items; if every
+    chunk is rejected, AdmissionRejected propagates so the caller can shed
+    the whole batch.
+    """
+    use_cache = settings.TAG_CACHE_ENABLED
+    keys = [tagging_cache_key(notes, llm.model) for notes in notes_list]
+    resolved: Dict[str, Union[TaggingResponse, str]] = {}
+    pending: Dict[str, int] = {}  # cache key -> index of the first note with that key
+
+    for index, key in enumerate(keys):
+        if key in resolved or key in pending:
+            continue
+        local = pretag(notes_list[index]) if settings.PRETAGGER_ENABLED else None
+        if local is not None:
+            TAG_RESULTS.inc("local")
+            resolved[key] = local
+            continue
+        cached = TAG_CACHE.get(key) if use_cache else None
+        if cached is not None:
+            TAG_RESULTS.inc("cache")
+            resolved[key] = cached
+        else:
+            pending[key] = index
+
+    pending_indices = list(pending.values())
+    chunk_size = max(1, settings.TAG_BATCH_CHUNK_SIZE)
+    chunks = [
+        {index: notes_list[index] for index in pending_indices[i:i + chunk_size]}
+        for i in range(0, len(pending_indices), chunk_size)
+    ]
+
+    semaphore = asyncio.Semaphore(max(1, settings.TAG_BATCH_MAX_CONCURRENCY))
+    rejections: List[AdmissionRejected] = []
+
+    async def run_chunk(chunk: Dict[int, str]) -> Dict[int, Union[TaggingResponse, str]]:
+        async with semaphore:
+            try:
+                async with TAG_BATCH_ADMISSION.admit():
+                    return await _tag_chunk(llm, chunk)
+            except AdmissionRejected as e:
+                rejections.append(e)
+                return {index: str(e) for index in chunk}
+
+    chunk_results_list = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+    if chunks and len(rejections) == len(chunks):
+        raise rejections[0]
+    for chunk_results in chunk_results_list:
+        for index, outcome in chunk_results.items():
+            resolved[keys[index]] = outcome
+            if isinstance(outcome, TaggingResponse):
+                TAG_RESULTS.inc("llm")
+                if use_cache:
+                    TAG_CACHE.set(keys[index], outcome)
+
+    results = []
+    for index, key in enumerate(keys):
+        outcome = resolved[key]
+        if isinstance(outcome, TaggingResponse):
+            results.append(BatchTaggingResult(index=index, result=outcome))
+        else:
+            results.append(BatchTaggingResult(index=index, error=outcome))
+    return results
@@ -25,7 +25,10 @@ class ChatRequest(BaseModel):
     """Schema for the main message payload received from the Main Backend."""
     user_id: str = Field(..., description="Anonymized ID for data fetching/tool calls.")
     user_plan: str = Field(..., description="User's SaaS tier (e.g., 'pro', 'free').")
-    history: List[ChatMessage] = Field(..., description="Full conversation history for context.")
+    history: Optional[List[ChatMessage]] = Field(
+        None,
+        description="Full conversation history. Omit to continue the server-side session; send it to start or resync one.",
+    )
     new_message: ChatMessage = Field(..., description="The latest message from the user.")
 
 
@@ -58,4 +61,23 @@ class TaggingRequest(BaseModel):
 
 class TaggingResponse(BaseModel):
     """Structured JSON response the AI is mandated to return for tagging."""
-    tags: List[str] = Field(..., description="A list of generated tags (e.g., 'FOMO', 'Breakout').")
\ No newline at end of file
+    tags: List[str] = Field(..., description="A list of generated tags (e.g., 'FOMO', 'Breakout').")
+
+class IndexedTaggingResponse(BaseModel):
+    """One element of the JSON array the AI returns when tagging a batch of notes."""
+    index: int = Field(..., description="Index of the note this entry refers to.")
+    tags: List[str] = Field(..., description="A list of generated tags for that note.")
+
+class BatchTaggingRequest(BaseModel):
+    """Schema for tagging many trades (e.g. a broker statement import) in one call."""
+    items: List[TaggingRequest] = Field(..., min_length=1, max_length=1000)
+
+class BatchTaggingResult(BaseModel):
+    """Per-item outcome of a batch tagging request; exactly one of result/error is set."""
+    index: int
+    result: Optional[TaggingResponse] = None
+    error: Optional[str] = None
+
+class BatchTaggingResponse(BaseModel):
+    """Results in the same order as BatchTaggingRequest.items."""
+    results: List[BatchTaggingResult]
\ No newline at end of file
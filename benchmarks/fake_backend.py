@@ -0,0 +1,117 @@
+"""
+Local stand-in for the main backend's internal trade API.
+
+Serves deterministic synthetic trades per user with configurable latency and
+an injected failure rate, so the data fetcher's pooling, timeouts and retries
+can be exercised offline. Point the app at it with MAIN_BACKEND_URL.
+
+    python -m benchmarks.fake_backend --port 8770 --trades 500
+    python -m benchmarks.fake_backend --check --failure-rate 0.3
+"""
+import argparse
+import asyncio
+import datetime as dt
+import os
+import random
+import threading
+import time
+import zlib
+
+from fastapi import FastAPI, HTTPException
+import uvicorn
+
+SYMBOLS = ["AAPL", "TSLA", "NVDA", "SPY", "QQQ", "EURUSD", "BTCUSD", "ES", "NQ", "MSFT"]
+TAGS = ["Breakout", "Reversal", "FOMO", "Good R:R", "Poor Exit", "Trend Follow", "Revenge Trade", "Scalp"]
+
+
+def synthetic_trades(user_id: str, count: int) -> list:
+    """Same user id always yields the same trades."""
+    rng = random.Random(zlib.crc32(user_id.encode("utf-8")))
+    start = dt.datetime(2025, 1, 1, 9, 30)
+    trades = []
+    for i in range(count):
+        entry = start + dt.timedelta(hours=rng.randint(0, 24 * 300))
+        is_open = rng.random() < 0.05
+        trades.append({
+            "id": f"{user_id}-{i}",
+            "symbol": rng.choice(SYMBOLS),
+            "direction": rng.choice(["long", "short"]),
+            "entry_datetime": entry.isoformat(),
+            "exit_datetime": None if is_open else (entry + dt.timedelta(minutes=rng.randint(1, 600))).isoformat(),
+            "pnl": None if is_open else round(rng.gauss(25, 180), 2),
+            "tags": rng.sample(TAGS, rng.randint(0, 3)),
+        })
+    return trades
+
+
+def create_app(trades_per_user: int = 200, latency_s: float = 0.02, failure_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Fake Main Backend")
+    app.state.requests = 0
+
+    @app.get("/api/v1/internal/users/{user_id}/trades")
+    async def user_trades(user_id: str):
+        app.state.requests += 1
+        await asyncio.sleep(latency_s)
+        if random.random() < failure_rate:
+            raise HTTPException(status_code=503, detail="Injected failure")
+        return {"trades": synthetic_trades(user_id, trades_per_user)}
+
+    return app
+
+
+def start_fake_backend(port: int, **kwargs) -> tuple:
+    app = create_app(**kwargs)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, app
+
+
+async def check(port: int, users: int, concurrency: int) -> None:
+    """Drives the real DataFetcher against the stand-in and reports outcomes."""
+    from app.libs.data_fetcher import DataFetchError, get_data_fetcher
+
+    fetcher = get_data_fetcher()
+    await fetcher.start()
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = {"ok": 0, "failed": 0}
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            try:
+                trades = await fetcher.get_user_trades(f"user-{i}")
+                assert trades and trades[0].id.startswith(f"user-{i}-")
+                outcomes["ok"] += 1
+            except DataFetchError:
+                outcomes["failed"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(users)))
+    wall = time.perf_counter() - start
+    await fetcher.aclose()
+    print(f"{users} users  ok={outcomes['ok']} failed={outcomes['failed']}  wall={wall:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8770)
+    parser.add_argument("--trades", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--check", action="store_true", help="run the DataFetcher against the stand-in and exit")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    options = dict(trades_per_user=args.trades, latency_s=args.latency, failure_rate=args.failure_rate)
+    if not args.check:
+        uvicorn.run(create_app(**options), host=args.host, port=args.port, log_level="warning")
+    else:
+        os.environ["MAIN_BACKEND_URL"] = f"http://127.0.0.1:{args.port}"
+        os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+        os.environ.setdefault("AI_SERVICE_SECRET_KEY", "bench-secret")
+        _, backend = start_fake_backend(args.port, **options)
+        asyncio.run(check(args.port, args.users, args.concurrency))
+        print(f"backend saw {backend.state.requests} requests (retries included)")
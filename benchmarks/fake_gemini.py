@@ -0,0 +1,247 @@
+"""
+Deterministic local stand-in for the Gemini REST API.
+
+Serves `generateContent`, `streamGenerateContent` (word-by-word SSE),
+`batchEmbedContents` and `cachedContents`, answers tool-enabled analytics
+questions with a function call, and can inject latency distributions and
+API errors, so the service can be load-tested offline without spending API
+money. Latency and error draws come from a seeded RNG: the same settings
+replay the same sequence. Point the app at it with GEMINI_BASE_URL.
+
+    python -m benchmarks.fake_gemini --port 8765 --latency 0.5
+    python -m benchmarks.fake_gemini --latency 0.4 --latency-dist lognormal --spread 0.6 \\
+        --tail-rate 0.01 --tail-latency 5 --error-rate 0.02 --error-codes 429,503
+"""
+from collections import Counter
+from typing import Optional
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+
+# Questions containing these phrases trigger a function call when tools are declared
+TOOL_TRIGGERS = ("win rate", "p/l", "performance")
+
+
+def _respond_text(model: str, body: dict) -> dict:
+    """Builds the first `parts` entry of the canned response for a request."""
+    contents = body.get("contents", [])
+    config = body.get("generationConfig") or {}
+    schema = config.get("responseSchema") or config.get("responseJsonSchema") or {}
+
+    if config.get("responseMimeType") == "application/json" and str(schema.get("type", "")).upper() == "ARRAY":
+        prompt = json.dumps(contents)
+        indices = [int(i) for i in re.findall(r'\\"index\\":\s*(\d+)', prompt)]
+        return {"text": json.dumps([{"index": i, "tags": ["Breakout", "Good R:R"]} for i in indices])}
+    if config.get("responseMimeType") == "application/json":
+        return {"text": json.dumps({"tags": ["Breakout", "Good R:R"]})}
+
+    declarations = [
+        decl for tool in body.get("tools", []) for decl in tool.get("functionDeclarations", [])
+    ]
+    answered = any("functionResponse" in part for c in contents for part in c.get("parts", []))
+    last_text = " ".join(
+        part.get("text", "") for part in (contents[-1].get("parts", []) if contents else [])
+    ).lower()
+    if declarations and not answered and any(t in last_text for t in TOOL_TRIGGERS):
+        return {"functionCall": {"name": declarations[0]["name"], "args": {}}}
+
+    return {"text": f"[fake {model}] Analysis complete. Your numbers look consistent with your plan."}
+
+
+def _response(model: str, part: dict) -> dict:
+    return {
+        "candidates": [
+            {"content": {"role": "model", "parts": [part]}, "finishReason": "STOP"}
+        ],
+        "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 5, "totalTokenCount": 15},
+        "modelVersion": model,
+    }
+
+
+def _embedding(text: str, dimensions: int) -> list:
+    """Hashed bag-of-words vector: paraphrases sharing most words come out close."""
+    values = [0.0] * dimensions
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+        values[int.from_bytes(digest[:4], "little") % dimensions] += 1.0 if digest[4] & 1 else -1.0
+    return values
+
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+_ERROR_STATUSES = {
+    400: "INVALID_ARGUMENT", 429: "RESOURCE_EXHAUSTED", 500: "INTERNAL",
+    503: "UNAVAILABLE", 504: "DEADLINE_EXCEEDED",
+}
+
+
+class LatencyModel:
+    """
+    Seeded latency sampler around a median of `latency_s`.
+
+    fixed: always `latency_s`; uniform: within +/- `spread` * latency_s;
+    lognormal: shape `spread` (0.5 gives a p99 of roughly 3x the median).
+    A `tail_rate` share of calls stalls for `tail_latency_s` instead, like a
+    stuck upstream connection.
+    """
+
+    def __init__(
+        self,
+        latency_s: float,
+        dist: str = "fixed",
+        spread: float = 0.5,
+        tail_rate: float = 0.0,
+        tail_latency_s: float = 5.0,
+        rng: Optional[random.Random] = None,
+    ):
+        if dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {dist!r}; use one of {LATENCY_DISTRIBUTIONS}.")
+        self.latency_s = latency_s
+        self.dist = dist
+        self.spread = spread
+        self.tail_rate = tail_rate
+        self.tail_latency_s = tail_latency_s
+        self.rng = rng or random.Random(0)
+
+    def sample(self) -> float:
+        if self.tail_rate and self.rng.random() < self.tail_rate:
+            return self.tail_latency_s
+        if self.dist == "uniform":
+            return max(0.0, self.latency_s * (1 + self.rng.uniform(-self.spread, self.spread)))
+        if self.dist == "lognormal":
+            return self.latency_s * self.rng.lognormvariate(0.0, self.spread)
+        return self.latency_s
+
+
+def _error_response(code: int) -> JSONResponse:
+    status = _ERROR_STATUSES.get(code, "UNKNOWN")
+    return JSONResponse(
+        {"error": {"code": code, "message": f"Injected {status} from the fake Gemini server.", "status": status}},
+        status_code=code,
+    )
+
+
+def create_app(
+    latency_s: float = 0.5,
+    chunk_delay_s: float = 0.02,
+    latency_dist: str = "fixed",
+    spread: float = 0.5,
+    tail_rate: float = 0.0,
+    tail_latency_s: float = 5.0,
+    error_rate: float = 0.0,
+    error_codes: tuple = (429, 503),
+    seed: int = 0,
+) -> FastAPI:
+    app = FastAPI(title="Fake Gemini")
+    rng = random.Random(seed)
+    latency = LatencyModel(latency_s, latency_dist, spread, tail_rate, tail_latency_s, rng)
+    # Calls per action and injected errors per status code, for reports.
+    app.state.calls = Counter()
+    app.state.errors = Counter()
+
+    @app.post("/{api_version}/models/{model_action}")
+    async def models_action(api_version: str, model_action: str, request: Request):
+        model, _, action = model_action.partition(":")
+        body = await request.json()
+        app.state.calls[action] += 1
+        delay = latency.sample()
+        if error_rate and rng.random() < error_rate:
+            code = rng.choice(error_codes)
+            app.state.errors[code] += 1
+            # Failures tend to come back faster than answers.
+            await asyncio.sleep(delay / 4)
+            return _error_response(code)
+
+        if action == "batchEmbedContents":
+            await asyncio.sleep(delay / 10)
+            return {
+                "embeddings": [
+                    {
+                        "values": _embedding(
+                            " ".join(p.get("text", "") for p in req.get("content", {}).get("parts", [])),
+                            req.get("outputDimensionality") or 768,
+                        )
+                    }
+                    for req in body.get("requests", [])
+                ]
+            }
+        part = _respond_text(model, body)
+
+        if action != "streamGenerateContent":
+            await asyncio.sleep(delay)
+            return _response(model, part)
+
+        async def sse():
+            # Time-to-first-token is a fraction of the full latency.
+            await asyncio.sleep(delay / 4)
+            if "text" not in part:
+                yield f"data: {json.dumps(_response(model, part))}\r\n\r\n"
+                return
+            for word in re.findall(r"\S+\s*", part["text"]):
+                yield f"data: {json.dumps(_response(model, {'text': word}))}\r\n\r\n"
+                await asyncio.sleep(chunk_delay_s)
+
+        return StreamingResponse(sse(), media_type="text/event-stream")
+
+    # --- Context caching (cachedContents) ---
+    app.state.cached_contents = {}
+
+    @app.post("/{api_version}/cachedContents")
+    async def create_cached_content(api_version: str, request: Request):
+        body = await request.json()
+        name = f"cachedContents/fake-{len(app.state.cached_contents) + 1}"
+        app.state.cached_contents[name] = body
+        return {"name": name, "model": body.get("model"), "expireTime": "2099-01-01T00:00:00Z"}
+
+    @app.patch("/{api_version}/cachedContents/{cache_id}")
+    async def update_cached_content(api_version: str, cache_id: str):
+        return {"name": f"cachedContents/{cache_id}", "expireTime": "2099-01-01T00:00:00Z"}
+
+    @app.delete("/{api_version}/cachedContents/{cache_id}")
+    async def delete_cached_content(api_version: str, cache_id: str):
+        app.state.cached_contents.pop(f"cachedContents/{cache_id}", None)
+        return {}
+
+    return app
+
+
+def add_fake_gemini_arguments(parser: argparse.ArgumentParser) -> None:
+    """Shared CLI flags for scripts that start this server."""
+    parser.add_argument("--latency", type=float, default=0.5, help="median latency in seconds")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--spread", type=float, default=0.5, help="uniform half-width or lognormal shape")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="share of calls that stall")
+    parser.add_argument("--tail-latency", type=float, default=5.0, help="stall duration in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls that fail")
+    parser.add_argument("--error-codes", default="429,503", help="comma-separated HTTP codes to inject")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def fake_gemini_options(args: argparse.Namespace) -> dict:
+    return dict(
+        latency_s=args.latency,
+        latency_dist=args.latency_dist,
+        spread=args.spread,
+        tail_rate=args.tail_rate,
+        tail_latency_s=args.tail_latency,
+        error_rate=args.error_rate,
+        error_codes=tuple(int(code) for code in args.error_codes.split(",") if code),
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_fake_gemini_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(**fake_gemini_options(args)), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,158 @@
+"""
+JSON encode/decode paths: stdlib vs orjson vs pydantic's Rust core.
+
+Compares, per request, for large batch and history payloads:
+
+  1. Response rendering through FastAPI (in-process ASGI round trip) with a
+     `response_model` and the default response class, which FastAPI now
+     serializes straight to bytes with pydantic, vs ORJSONResponse and
+     JSONResponse as the response class.
+  2. Hand-written JSON: SSE event payloads and the batch tagging prompt,
+     `json.dumps` vs app.libs.fast_json (orjson).
+  3. Parsing Gemini's batch tagging output: `json.loads` + per-item
+     validation vs orjson + validation vs a pydantic TypeAdapter.
+  4. Parsing a ChatRequest body: `model_validate_json` vs orjson + `model_validate`.
+
+    python -m benchmarks.json_paths
+"""
+from typing import List
+import asyncio
+import json
+import os
+import statistics
+import time
+import warnings
+
+from .microbench import _history, measure
+
+SIZES = (100, 1000)
+
+
+def _row(label: str, timings: dict, reference: float) -> None:
+    print(f"  {label:<44} {timings['best_us']:>10.1f}us  {reference / timings['best_us']:5.2f}x")
+
+
+async def _asgi_us(app, path: str, rounds: int = 5, requests: int = 50) -> dict:
+    import httpx
+
+    per_call = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.get(path)
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(requests):
+                (await client.get(path)).raise_for_status()
+            per_call.append((time.perf_counter() - start) / requests * 1e6)
+    return {"best_us": round(min(per_call), 2), "median_us": round(statistics.median(per_call), 2)}
+
+
+def _app(response_class, batch, history):
+    from fastapi import FastAPI
+
+    from app.schemas.llm_schemas import BatchTaggingResponse, ChatMessage
+
+    kwargs = {} if response_class is None else {"default_response_class": response_class}
+    app = FastAPI(**kwargs)
+
+    @app.get("/batch", response_model=BatchTaggingResponse)
+    async def batch_route():
+        return batch
+
+    @app.get("/history", response_model=List[ChatMessage])
+    async def history_route():
+        return history
+
+    return app
+
+
+def response_rendering() -> None:
+    from fastapi.responses import JSONResponse, ORJSONResponse
+
+    from app.schemas.llm_schemas import BatchTaggingResponse, BatchTaggingResult, ChatMessage, TaggingResponse
+
+    print("1. FastAPI response rendering (per request, in-process ASGI, 1.00x = JSONResponse)")
+    for n in SIZES:
+        batch = BatchTaggingResponse(results=[
+            BatchTaggingResult(index=i, result=TaggingResponse(tags=["Breakout", "Good R:R", "FOMO"]))
+            for i in range(n)
+        ])
+        history = [ChatMessage(**m) for m in _history(n)]
+        apps = {
+            "default (pydantic dump_json)": _app(None, batch, history),
+            "ORJSONResponse": _app(ORJSONResponse, batch, history),
+            "JSONResponse (stdlib json)": _app(JSONResponse, batch, history),
+        }
+        for path, label in (("/batch", f"BatchTaggingResponse[{n}]"), ("/history", f"List[ChatMessage][{n}]")):
+            print(f" {label}")
+            results = {name: asyncio.run(_asgi_us(app, path)) for name, app in apps.items()}
+            reference = results["JSONResponse (stdlib json)"]["best_us"]
+            for name, timings in results.items():
+                _row(name, timings, reference)
+
+
+def hand_serialized() -> None:
+    from app.libs import fast_json
+
+    print("2. Hand-written JSON (SSE events, batch prompt)")
+    payloads = [
+        (f"SSE done event ({n // 10} messages of text)",
+         {"role": "assistant", "content": " ".join(m["content"] for m in _history(n // 10))})
+        for n in SIZES
+    ]
+    payloads.append(("batch prompt notes[25]", [{"index": i, "notes": m["content"]} for i, m in enumerate(_history(25))]))
+    for label, payload in payloads:
+        stdlib = measure(lambda: json.dumps(payload, ensure_ascii=False), 5, 0.05)
+        print(f" {label}")
+        _row("json.dumps", stdlib, stdlib["best_us"])
+        _row(f"fast_json.dumps (orjson={'yes' if fast_json.orjson else 'no'})",
+             measure(lambda: fast_json.dumps(payload), 5, 0.05), stdlib["best_us"])
+
+
+def llm_output_parsing() -> None:
+    import orjson
+    from pydantic import TypeAdapter
+
+    from app.schemas.llm_schemas import IndexedTaggingResponse
+
+    adapter = TypeAdapter(List[IndexedTaggingResponse])
+    print("3. Parsing batch tagging output from Gemini")
+    for n in (25, 100):
+        text = json.dumps([{"index": i, "tags": ["Breakout", "Good R:R", "FOMO"]} for i in range(n)])
+        old = measure(lambda: [IndexedTaggingResponse.model_validate(x) for x in json.loads(text)], 5, 0.05)
+        print(f" {n} items")
+        _row("json.loads + model_validate per item", old, old["best_us"])
+        _row("orjson.loads + model_validate per item",
+             measure(lambda: [IndexedTaggingResponse.model_validate(x) for x in orjson.loads(text)], 5, 0.05),
+             old["best_us"])
+        _row("TypeAdapter.validate_json (used)", measure(lambda: adapter.validate_json(text), 5, 0.05), old["best_us"])
+
+
+def request_parsing() -> None:
+    import orjson
+
+    from app.schemas.llm_schemas import ChatRequest
+
+    print("4. Parsing a ChatRequest body")
+    for n in SIZES:
+        body = json.dumps({
+            "user_id": "u", "user_plan": "pro", "history": _history(n),
+            "new_message": {"role": "user", "content": "What's my win rate?"},
+        }).encode()
+        native = measure(lambda: ChatRequest.model_validate_json(body), 5, 0.05)
+        print(f" history[{n}]")
+        _row("model_validate_json (FastAPI default)", native, native["best_us"])
+        _row("orjson.loads + model_validate", measure(lambda: ChatRequest.model_validate(orjson.loads(body)), 5, 0.05),
+             native["best_us"])
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+    os.environ.setdefault("MAIN_BACKEND_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("AI_SERVICE_SECRET_KEY", "bench-secret")
+    # FastAPI warns on every ORJSONResponse request; it is measured here on purpose.
+    warnings.filterwarnings("ignore", message="ORJSONResponse is deprecated")
+    print("speedup is relative to the stdlib / previous path of each group (1.00x)\n")
+    response_rendering()
+    hand_serialized()
+    llm_output_parsing()
+    request_parsing()
@@ -0,0 +1,81 @@
+"""
+Proves that in-flight LLM calls overlap instead of serializing the event loop.
+
+Starts the fake Gemini server in a background thread, points the app at it and
+fires N concurrent requests at `/tag-trade` and `/chat/{session_id}` through an
+in-process ASGI transport. With a non-blocking client the wall time stays close
+to a single call's latency; a blocking client would take roughly N times longer.
+
+    python -m benchmarks.llm_concurrency --requests 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+import uvicorn
+
+from .fake_gemini import create_app
+
+
+def start_fake_gemini(port: int, latency_s: float, **options) -> uvicorn.Server:
+    """Runs the fake Gemini server in a daemon thread; `options` go to `create_app`."""
+    server = uvicorn.Server(
+        uvicorn.Config(create_app(latency_s, **options), host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def drive(n_requests: int, latency_s: float) -> None:
+    import httpx
+    from main import app
+
+    headers = {"X-Microservice-Auth": os.environ["AI_SERVICE_SECRET_KEY"]}
+    chat_body = {
+        "user_id": "bench-user",
+        "user_plan": "pro",
+        "history": [{"role": "user", "content": "How did I do this week?"}],
+        "new_message": {"role": "user", "content": "How did I do this week?"},
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for label, path, body in [
+            ("/tag-trade", "/tag-trade", {"notes": "Breakout entry, took profit at target."}),
+            ("/chat/{session_id}", "/chat/bench-session", chat_body),
+        ]:
+            start = time.perf_counter()
+            responses = await asyncio.gather(
+                *(client.post(path, json=body, headers=headers) for _ in range(n_requests))
+            )
+            wall = time.perf_counter() - start
+            ok = sum(r.status_code == 200 for r in responses)
+            serial = n_requests * latency_s
+            print(
+                f"{label:<20} {ok}/{n_requests} ok  wall={wall:.2f}s  "
+                f"serialized~{serial:.2f}s  overlap={serial / wall:.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+    os.environ.setdefault("MAIN_BACKEND_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("AI_SERVICE_SECRET_KEY", "bench-secret")
+    # Every request must reach Gemini: no local pre-tagging, no cached answers.
+    os.environ["PRETAGGER_ENABLED"] = "false"
+    os.environ["TAG_CACHE_ENABLED"] = "false"
+    os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+
+    start_fake_gemini(args.port, args.latency)
+    asyncio.run(drive(args.requests, args.latency))
@@ -0,0 +1,197 @@
+"""
+Open-loop load test: drives `/tag-trade` and `/chat/{session_id}` at a fixed
+request rate and reports latency percentiles.
+
+Requests start on a fixed schedule, not when the previous one returns, and
+latency is measured from each request's scheduled start. A stalled server
+therefore shows up as queueing delay instead of quietly lowering the offered
+load (coordinated omission).
+
+By default the app runs in-process (ASGI transport) against the fake Gemini
+server and fake main backend, both started in background threads, and the
+fake Gemini flags below shape its latency and errors. In-process numbers share
+one event loop with the load generator and the ASGI transport buffers whole
+responses (no time-to-first-token), so use them to compare changes; for
+absolute numbers run the app with `python serve.py` and pass --url.
+
+    python -m benchmarks.load_test --scenario tag --rps 50 --duration 20
+    python -m benchmarks.load_test --scenario chat --rps 10 --latency-dist lognormal --error-rate 0.02
+    python -m benchmarks.load_test --scenario mixed --rps 40 --url http://127.0.0.1:8001
+"""
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from .fake_gemini import add_fake_gemini_arguments, fake_gemini_options
+
+SCENARIOS = ("tag", "chat", "chat_stream", "mixed")
+MIXED_WEIGHTS = {"tag": 0.7, "chat": 0.2, "chat_stream": 0.1}
+
+# Free-form notes so the local pre-tagger does not answer them; a per-request
+# suffix keeps the tag cache out of the measurement.
+NOTES = [
+    "Felt anxious all morning, hesitated on the entry and then doubled down when it went against me",
+    "Long because sector rotation into semis looked strong, sized normally, closed flat at lunch",
+    "Waited for confirmation on the 5 minute chart before entering, market was choppy",
+    "Short into resistance, volume dried up so I scaled out in thirds",
+]
+# Half the questions trigger a tool call on the fake server (two Gemini calls), half do not.
+QUESTIONS = [
+    "What's my win rate on the last {n} trades?",
+    "Give me one tip to stay patient on trade {n}.",
+    "How is my performance on setup {n}?",
+    "Summarize the mindset notes from session {n}.",
+]
+
+
+class Result:
+    __slots__ = ("scenario", "status", "latency_s", "ttft_s")
+
+    def __init__(self, scenario: str, status: str, latency_s: float, ttft_s: Optional[float] = None):
+        self.scenario = scenario
+        self.status = status
+        self.latency_s = latency_s
+        self.ttft_s = ttft_s
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _chat_body(i: int) -> dict:
+    # One user and session per request: every call is a first turn, and the
+    # semantic cache never sees a repeat.
+    return {
+        "user_id": f"load-user-{i}",
+        "user_plan": "pro" if i % 3 else "free",
+        "history": [],
+        "new_message": {"role": "user", "content": QUESTIONS[i % len(QUESTIONS)].format(n=i)},
+    }
+
+
+async def _one(client, scenario: str, i: int, scheduled: float, headers: dict) -> Result:
+    try:
+        if scenario == "tag":
+            body = {"notes": f"{NOTES[i % len(NOTES)]} (trade {i})"}
+            response = await client.post("/tag-trade", json=body, headers=headers)
+            return Result(scenario, str(response.status_code), time.perf_counter() - scheduled)
+
+        if scenario == "chat":
+            response = await client.post(f"/chat/load-{i}", json=_chat_body(i), headers=headers)
+            return Result(scenario, str(response.status_code), time.perf_counter() - scheduled)
+
+        ttft = None
+        status = None
+        async with client.stream("POST", f"/chat/load-{i}/stream", json=_chat_body(i), headers=headers) as response:
+            status = str(response.status_code)
+            async for line in response.aiter_lines():
+                if ttft is None and line.startswith("event: token"):
+                    ttft = time.perf_counter() - scheduled
+                elif line.startswith("event: error"):
+                    status = "sse_error"
+        return Result(scenario, status, time.perf_counter() - scheduled, ttft)
+    except Exception as e:
+        return Result(scenario, type(e).__name__, time.perf_counter() - scheduled)
+
+
+async def run_load(
+    client, scenario: str, rps: float, duration_s: float, headers: dict, seed: int, first_index: int = 0
+) -> List[Result]:
+    """Starts request i at start + i/rps; `first_index` keeps notes and sessions unique across runs."""
+    rng = random.Random(seed)
+    names = list(MIXED_WEIGHTS)
+    weights = list(MIXED_WEIGHTS.values())
+    total = int(rps * duration_s)
+    tasks = []
+    start = time.perf_counter()
+    for i in range(total):
+        scheduled = start + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind = rng.choices(names, weights)[0] if scenario == "mixed" else scenario
+        tasks.append(asyncio.ensure_future(_one(client, kind, first_index + i, scheduled, headers)))
+    lag = time.perf_counter() - (start + (total - 1) / rps) if total else 0.0
+    if lag > 0.05:
+        print(f"WARNING: the load generator fell {lag:.2f}s behind schedule; results understate the offered load.")
+    return list(await asyncio.gather(*tasks))
+
+
+def report(results: List[Result], duration_s: float, show_ttft: bool = True) -> None:
+    by_scenario: Dict[str, List[Result]] = defaultdict(list)
+    for result in results:
+        by_scenario[result.scenario].append(result)
+
+    for scenario, rows in sorted(by_scenario.items()):
+        statuses = Counter(r.status for r in rows)
+        ok = [r.latency_s * 1000 for r in rows if r.status.startswith("2")]
+        print(f"\n{scenario}: {len(rows)} requests, {len(ok)} ok, {len(rows) / duration_s:.1f} req/s offered")
+        print("  status: " + ", ".join(f"{code}={n}" for code, n in sorted(statuses.items())))
+        if ok:
+            print(
+                "  latency ms: "
+                + "  ".join(f"p{int(q * 1000) / 10:g}={_percentile(ok, q):.1f}" for q in (0.5, 0.9, 0.99, 0.999))
+                + f"  max={max(ok):.1f}  mean={statistics.mean(ok):.1f}"
+            )
+        ttfts = [r.ttft_s * 1000 for r in rows if r.ttft_s is not None]
+        if ttfts and show_ttft:
+            print(f"  time to first token ms: p50={_percentile(ttfts, 0.5):.1f}  p99={_percentile(ttfts, 0.99):.1f}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    import httpx
+
+    headers = {"X-Microservice-Auth": os.environ["AI_SERVICE_SECRET_KEY"]}
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits)
+    else:
+        from main import app
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=args.timeout)
+
+    async with client:
+        if args.warmup:
+            await run_load(client, args.scenario, args.rps, args.warmup, headers, args.seed + 1)
+        first_index = int(args.rps * args.warmup)
+        results = await run_load(client, args.scenario, args.rps, args.duration, headers, args.seed, first_index)
+    print(f"scenario={args.scenario} rps={args.rps} duration={args.duration}s target={args.url or 'in-process'}")
+    report(results, args.duration, show_ttft=bool(args.url))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS, default="tag")
+    parser.add_argument("--rps", type=float, default=20.0)
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before the run")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--url", help="target a running server instead of the in-process app")
+    parser.add_argument("--port", type=int, default=8765, help="fake Gemini port")
+    parser.add_argument("--backend-port", type=int, default=8770, help="fake main backend port")
+    add_fake_gemini_arguments(parser)
+    args = parser.parse_args()
+
+    os.environ.setdefault("AI_SERVICE_SECRET_KEY", "bench-secret")
+    if not args.url:
+        from .fake_backend import start_fake_backend
+        from .llm_concurrency import start_fake_gemini
+
+        os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+        os.environ["MAIN_BACKEND_URL"] = f"http://127.0.0.1:{args.backend_port}"
+        os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+        options = fake_gemini_options(args)
+        fake = start_fake_gemini(args.port, options.pop("latency_s"), **options)
+        start_fake_backend(args.backend_port)
+
+    asyncio.run(main(args))
+
+    if not args.url:
+        app = fake.config.app
+        print(f"\nfake Gemini calls: {dict(app.state.calls)}  injected errors: {dict(app.state.errors)}")
@@ -0,0 +1,144 @@
+"""
+Microbenchmarks for the per-request CPU work that grows with chat history.
+
+Measures, at 10/100/1000-message histories:
+
+  * validate_request   - `ChatRequest.model_validate_json` on the raw body;
+  * convert_history    - `SessionHistory(...)`, i.e. the `message_to_content` loop;
+  * serialize_contents - dumping the Gemini request contents to JSON, as the SDK
+                         does before every generateContent call;
+
+plus serialize_response, the JSON encoding of the `ChatMessage` reply.
+
+Results are compared with the stored baseline (best-of-N time per call) and
+the script exits non-zero if anything regressed beyond --tolerance. Baselines
+are machine-specific: re-record them with --save on the machine that runs
+the comparison.
+
+    python -m benchmarks.microbench
+    python -m benchmarks.microbench --save
+    python -m benchmarks.microbench --only convert_history --tolerance 0.5
+"""
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import timeit
+
+SIZES = (10, 100, 1000)
+BASELINE_PATH = Path(__file__).parent / "baselines" / "microbench.json"
+
+_WORDS = (
+    "entry exit stop target breakout pullback risk reward plan size position long short "
+    "market open close volume trend support resistance profit loss win rate journal"
+).split()
+
+
+def _history(n: int, seed: int = 0) -> List[dict]:
+    """Alternating user/assistant messages of realistic length (20-80 words)."""
+    rng = random.Random(seed)
+    return [
+        {
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": " ".join(rng.choice(_WORDS) for _ in range(rng.randint(20, 80))),
+        }
+        for i in range(n)
+    ]
+
+
+def build_cases() -> List[Tuple[str, Callable[[], object]]]:
+    from fastapi.responses import JSONResponse
+
+    from app.libs.session_store import SessionHistory
+    from app.schemas.llm_schemas import ChatMessage, ChatRequest
+
+    cases = []
+    for n in SIZES:
+        raw = _history(n)
+        body = json.dumps({
+            "user_id": "bench-user",
+            "user_plan": "pro",
+            "history": raw,
+            "new_message": {"role": "user", "content": "What's my win rate this month?"},
+        }).encode("utf-8")
+        messages = [ChatMessage(**m) for m in raw]
+        contents = SessionHistory(messages).contents
+
+        cases.append((f"validate_request[{n}]", lambda body=body: ChatRequest.model_validate_json(body)))
+        cases.append((f"convert_history[{n}]", lambda messages=messages: SessionHistory(messages)))
+        cases.append((
+            f"serialize_contents[{n}]",
+            lambda contents=contents: json.dumps(
+                [c.model_dump(mode="json", exclude_none=True) for c in contents]
+            ),
+        ))
+
+    reply = ChatMessage(role="assistant", content=" ".join(_WORDS * 8))
+    cases.append(("serialize_response", lambda: JSONResponse(reply.model_dump(mode="json")).body))
+    return cases
+
+
+def measure(fn: Callable[[], object], repeat: int, min_time_s: float) -> Dict[str, float]:
+    """Best and median microseconds per call over `repeat` timed batches of at least `min_time_s`."""
+    timer = timeit.Timer(fn)
+    number = 1
+    while timer.timeit(number) < min_time_s:
+        number *= 2
+    per_call = [t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number)]
+    return {"best_us": round(min(per_call), 2), "median_us": round(statistics.median(per_call), 2)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", action="store_true", help="record the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--only", help="run only cases whose name starts with this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.1, help="seconds per timed batch")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text())["results"] if args.baseline.exists() else {}
+    results = {}
+    regressions = []
+    for name, fn in build_cases():
+        if args.only and not name.startswith(args.only):
+            continue
+        results[name] = measure(fn, args.repeat, args.min_time)
+        line = f"{name:<28} best={results[name]['best_us']:>10.1f}us  median={results[name]['median_us']:>10.1f}us"
+        reference = baseline.get(name)
+        if reference:
+            ratio = results[name]["best_us"] / reference["best_us"]
+            line += f"  vs baseline {ratio:5.2f}x"
+            if ratio > 1 + args.tolerance:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        previous = baseline if args.only else {}
+        args.baseline.write_text(json.dumps({
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}",
+            "results": {**previous, **results},
+        }, indent=2) + "\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+    os.environ.setdefault("MAIN_BACKEND_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("AI_SERVICE_SECRET_KEY", "bench-secret")
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+Hit rate and latency split of the local pre-tagger.
+
+Builds a deterministic corpus of journal notes (formulaic ones made from the
+tag vocabulary, free-form ones, and negated ones), then reports:
+
+  * precision on a hand-labelled set of realistic notes: a local answer may
+    only carry tags a human gave the note (the script exits 1 otherwise).
+    The synthetic corpus is built from vocabulary phrases, so its hit rate
+    only shows how often the pre-tagger fires, not whether it is right;
+  * how many notes the pre-tagger answers locally, per kind of note;
+  * the pre-tagger's own latency (microseconds per note);
+  * with --e2e, end-to-end `/tag-trade` latency for local hits versus notes
+    that fall through to the fake Gemini server.
+
+    python -m benchmarks.pretagger --notes 2000
+    python -m benchmarks.pretagger --notes 200 --e2e --latency 0.3
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+FORMULAIC_PHRASES = [
+    "breakout", "broke out", "took profit at target", "hit my target", "stopped out",
+    "fomo", "chased the move", "revenge trade", "scalped", "gap and go", "pullback",
+    "bought the dip", "good r:r", "3r winner", "followed my plan", "moved my stop", "oversized",
+    "exited too early", "reversal", "with the trend", "earnings", "panic sold",
+]
+FILLERS = ["", "", "then", "and", "on the open", "again"]
+FREE_FORM = [
+    "Felt anxious all morning, hesitated on the entry and then doubled down when it went against me",
+    "Long {sym} because sector rotation into semis looked strong, sized normally, closed flat at lunch",
+    "Waited for confirmation on the 5 minute chart before entering {sym}, market was choppy",
+    "Short {sym} into resistance, volume dried up so I scaled out in thirds",
+    "Not sure why I took this one, probably boredom",
+    "{sym} held VWAP all day, added on the retest and trailed the rest",
+]
+NEGATED = ["didn't fomo this time", "no revenge trade today", "not a breakout, just noise", "never chased"]
+SYMBOLS = ["AAPL", "TSLA", "NVDA", "SPY", "ES", "BTCUSD"]
+
+# (note, tags a human would give it); None means only the LLM should tag it.
+# A local answer is wrong if it carries any tag outside the expected ones.
+LABELLED = [
+    ("stopped out", ["Stopped Out"]),
+    ("Breakout entry, took profit at target.", ["Breakout", "Target Hit"]),
+    ("chased the move, stopped out", ["FOMO", "Stopped Out"]),
+    ("revenge trade after the open", ["Revenge Trade"]),
+    ("followed my plan, hit my target", ["Followed Plan", "Target Hit"]),
+    ("bought the dip, 3R winner", ["Pullback", "Good R:R"]),
+    ("moved my stop and got stopped out", ["Moved Stop", "Stopped Out"]),
+    ("gap and go on earnings", ["Gap", "News"]),
+    ("panic sold the breakout", ["Poor Exit", "Breakout"]),
+    ("stopped out, lost 2r", ["Stopped Out"]),
+    ("lost 3r, stopped out", ["Stopped Out"]),
+    ("stop loss hit, 2r loss", ["Stopped Out"]),
+    ("breakout failed, -2R", ["Breakout"]),
+    ("good r:r but lost anyway", ["Good R:R"]),
+    ("fed up, chased", ["FOMO"]),
+    ("didn't fomo this time", None),
+    ("no revenge trade today", None),
+    ("not a breakout, just noise", None),
+    ("2r", None),
+    ("took a 3r loss on the reversal", None),
+]
+
+
+def build_corpus(n: int, seed: int = 7) -> list:
+    """(kind, note) pairs: 60% formulaic, 30% free-form, 10% negated."""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(n):
+        roll = rng.random()
+        if roll < 0.6:
+            phrases = rng.sample(FORMULAIC_PHRASES, rng.randint(1, 3))
+            note = f" {rng.choice(FILLERS)} ".join(phrases).strip()
+            if rng.random() < 0.5:
+                note = note.capitalize() + "."
+            corpus.append(("formulaic", " ".join(note.split())))
+        elif roll < 0.9:
+            corpus.append(("free_form", rng.choice(FREE_FORM).format(sym=rng.choice(SYMBOLS))))
+        else:
+            corpus.append(("negated", rng.choice(NEGATED)))
+    return corpus
+
+
+def _percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def precision_report() -> bool:
+    """Prints precision on LABELLED; False if any local answer carries a wrong tag."""
+    from app.libs.pretagger import pretag
+
+    answered = 0
+    wrong = []
+    for note, expected in LABELLED:
+        result = pretag(note)
+        if result is None:
+            continue
+        answered += 1
+        if not set(result.tags) <= set(expected or []):
+            wrong.append((note, result.tags, expected))
+    precision = (answered - len(wrong)) / answered if answered else 1.0
+    print(f"pre-tagger on labelled notes: answered {answered}/{len(LABELLED)} locally, precision {precision:.1%}")
+    for note, got, expected in wrong:
+        print(f"  WRONG {note!r}: got {got}, expected {expected or 'the LLM'}")
+    return not wrong
+
+
+def local_report(corpus: list) -> None:
+    from app.libs.pretagger import pretag
+
+    hits = {}
+    timings_us = []
+    for kind, note in corpus:
+        start = time.perf_counter_ns()
+        result = pretag(note)
+        timings_us.append((time.perf_counter_ns() - start) / 1000)
+        total, hit = hits.get(kind, (0, 0))
+        hits[kind] = (total + 1, hit + (result is not None))
+
+    overall = sum(h for _, h in hits.values())
+    print(f"pre-tagger hit rate: {overall}/{len(corpus)} = {overall / len(corpus):.1%}")
+    for kind, (total, hit) in sorted(hits.items()):
+        print(f"  {kind:<10} {hit}/{total} = {hit / total:.1%}")
+    print(
+        f"pre-tagger latency: p50={_percentile(timings_us, 0.5):.1f}us "
+        f"p99={_percentile(timings_us, 0.99):.1f}us mean={statistics.mean(timings_us):.1f}us"
+    )
+
+
+async def e2e_report(corpus: list) -> None:
+    import httpx
+    from app.libs.pretagger import pretag
+    from main import app
+
+    headers = {"X-Microservice-Auth": os.environ["AI_SERVICE_SECRET_KEY"]}
+    split = {"local": [], "llm": []}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for _, note in corpus:
+            source = "local" if pretag(note) is not None else "llm"
+            start = time.perf_counter()
+            response = await client.post("/tag-trade", json={"notes": note}, headers=headers)
+            response.raise_for_status()
+            split[source].append((time.perf_counter() - start) * 1000)
+
+    for source, timings in split.items():
+        if timings:
+            print(
+                f"/tag-trade via {source:<5} n={len(timings):<5} "
+                f"p50={_percentile(timings, 0.5):.2f}ms p99={_percentile(timings, 0.99):.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--e2e", action="store_true", help="also time /tag-trade against the fake Gemini server")
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+    os.environ.setdefault("MAIN_BACKEND_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("AI_SERVICE_SECRET_KEY", "bench-secret")
+    # Measure the pre-tagger against the LLM, not against the tag cache.
+    os.environ["TAG_CACHE_ENABLED"] = "false"
+
+    precise = precision_report()
+    corpus = build_corpus(args.notes)
+    local_report(corpus)
+    if args.e2e:
+        from .llm_concurrency import start_fake_gemini
+
+        start_fake_gemini(args.port, args.latency)
+        asyncio.run(e2e_report(corpus))
+    sys.exit(0 if precise else 1)
@@ -1,16 +1,43 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import os
 
 # Imports relative to the ai-microservice folder
 from app.apis import chat
 from app.libs.config import settings 
+from app.libs.data_fetcher import get_data_fetcher
+from app.libs.llm_client import close_llm_client, init_llm_client
+from app.libs.metrics import METRICS, MetricsMiddleware
+from app.libs.resilience import OPEN, circuit_health
+from app.libs.session_store import close_session_store, get_session_store
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Opens per-process clients on startup and releases them on shutdown.
+    Runs once in every worker, so nothing is shared across processes.
+    """
+    init_llm_client()
+    get_session_store()
+    await get_data_fetcher().start()
+    yield
+    await get_data_fetcher().aclose()
+    await close_llm_client()
+    close_session_store()
+
 
 # 1. Initialize the FastAPI application
+# Keep the default response class: routes with a response_model are then
+# serialized straight to bytes by pydantic, which beats ORJSONResponse
+# (see benchmarks/json_paths.py). Hand-built JSON goes through app.libs.fast_json.
 app = FastAPI(
     title="TradeLM AI Microservice",
     description="Dedicated service for LLM processing and auto-tagging, protected by a secret key.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 
@@ -29,6 +56,9 @@ app.add_middleware(
     allow_headers=["X-Microservice-Auth"], 
 )
 
+# Outermost, so the measured latency covers the whole middleware stack.
+app.add_middleware(MetricsMiddleware)
+
 
 # 3. Include API Router
 # FIX: Change prefix="/" to prefix="" to resolve the Assertion Error.
@@ -37,5 +67,20 @@ app.include_router(chat.router, prefix="", tags=["AI Core"])
 
 @app.get("/health")
 def health_check():
-    """Simple health check endpoint to verify the service is running."""
-    return {"status": "ok", "service": "AI Microservice"}
\ No newline at end of file
+    """
+    Liveness plus dependency state. Always 200 while the process serves
+    requests; `status` is "degraded" when any circuit breaker is open.
+    """
+    circuits = circuit_health()
+    degraded = any(c["state"] == OPEN for c in circuits.values())
+    return {
+        "status": "degraded" if degraded else "ok",
+        "service": "AI Microservice",
+        "circuits": circuits,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Latency histograms and Gemini token counters in Prometheus text format (per worker)."""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
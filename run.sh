@@ -18,6 +18,7 @@ fi
 
 # 3. Start the Uvicorn server on the dedicated port (8001)
 # The application module is at app.main:app
+# Development only (single process, --reload). In production run: python serve.py
 echo "Starting FastAPI AI Microservice (http://0.0.0.0:8001)..."
 uvicorn main:app --app-dir app --host 0.0.0.0 --port ${PORT:-8001} --reload
 
@@ -0,0 +1,70 @@
+"""
+Production entry point for the TradeLM AI Microservice.
+
+    python serve.py
+
+Runs `main:app` under uvicorn with one worker process per CPU (or
+WEB_CONCURRENCY), the uvloop event loop and the httptools parser. Each worker
+imports the app and opens its own clients in the app lifespan; use
+`run.sh` only for local development (it enables --reload).
+"""
+import importlib.util
+import os
+
+import uvicorn
+
+from app.libs.config import settings
+
+
+def _worker_count() -> int:
+    if settings.WEB_CONCURRENCY > 0:
+        return settings.WEB_CONCURRENCY
+    return os.cpu_count() or 1
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main() -> None:
+    workers = _worker_count()
+    # Workers are spawned and read their settings from the environment, so
+    # per-process state that would go stale across workers is overridden here.
+    if workers > 1 and settings.SESSION_STORE_BACKEND == "memory":
+        print(
+            "SERVER WARNING: SESSION_STORE_BACKEND=memory keeps chat sessions per worker, so a worker could "
+            f"continue from a stale history; using 'sqlite' ({settings.SESSION_SQLITE_PATH}) for this run."
+        )
+        os.environ["SESSION_STORE_BACKEND"] = "sqlite"
+    if workers > 1 and settings.TRADE_CACHE_TTL_SECONDS > 0:
+        print(
+            "SERVER WARNING: POST /users/{id}/trades/invalidate only reaches the worker that serves it, so the "
+            "others would serve cached pre-edit trades; disabling the trade cache (TRADE_CACHE_TTL_SECONDS=0) "
+            "for this run. Concurrent fetches for a user are still shared within each worker."
+        )
+        os.environ["TRADE_CACHE_TTL_SECONDS"] = "0"
+    if workers > 1 and settings.SEMANTIC_CACHE_ENABLED:
+        print(
+            "SERVER WARNING: the semantic chat cache checks a per-worker trade data version and could replay "
+            "answers from before an invalidation; disabling it (SEMANTIC_CACHE_ENABLED=false) for this run."
+        )
+        os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+
+    uvicorn.run(
+        "main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=workers,
+        loop="uvloop" if _installed("uvloop") else "auto",
+        http="httptools" if _installed("httptools") else "auto",
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_S,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_SHUTDOWN_S,
+        limit_concurrency=settings.SERVER_LIMIT_CONCURRENCY or None,
+        proxy_headers=True,
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()